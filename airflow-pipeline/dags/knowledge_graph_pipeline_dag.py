@@ -4,151 +4,199 @@ from __future__ import annotations
 import pendulum
 
 import os
+from datetime import timedelta
 from airflow.models.dag import DAG
+from airflow.models.param import Param
 from airflow.providers.docker.operators.docker import DockerOperator
 from docker.types import Mount
 
 from airflow.providers.http.operators.http import SimpleHttpOperator
-from airflow.providers.http.sensors.http import HttpSensor
 from airflow.operators.python import BranchPythonOperator, PythonOperator
 from airflow.operators.empty import EmptyOperator
 from airflow.utils.trigger_rule import TriggerRule
 
+from batch_job_operators import OpenAIBatchOperator
+from pdf_text_extraction import convert_pdf_to_txt
+
 import logging
+import re
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 import shutil
 import requests
-import pypdfium2 as pdfium
-import ast
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 AIRFLOW_DATA_DIR_VOL = Path(os.getenv("AIRFLOW_DATA_DIR", "/opt/airflow/data"))
+PROCESSED_TXT_DIR_RELATIVE = Path("uploads") / "processed_txt"
+PROCESSED_TXT_DIR = AIRFLOW_DATA_DIR_VOL / PROCESSED_TXT_DIR_RELATIVE
 PIPELINE_API_CONN_ID = "pipeline_api"
 PIPELINE_API_BASE_URL = os.getenv("AIRFLOW_CONN_PIPELINE_API", "http://pipeline-api:8000")
+RESOURCES_API_URL = f"{PIPELINE_API_BASE_URL}/api/v1/resources"
+# Fila Celery da extração de PDF; aponte para "pdf_extract" para usar o worker dedicado (profile pdf-worker)
+PDF_EXTRACT_QUEUE = os.getenv("PDF_EXTRACT_QUEUE", "default")
+
+# Params não são renderizados pelo Jinja, então o id da run é compartilhado como template em todas as tasks
+PIPELINE_ID_TEMPLATE = "{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}"
 
 BATCH_TYPE_UC_GENERATION = "uc_generation"
 BATCH_TYPE_DIFFICULTY_ASSESSMENT = "difficulty_assessment"
-
-def _prepare_input_files_callable(run_id: str, resource_ids_for_run_input: str, **kwargs):
-    logging.info(f"Iniciando _prepare_input_files_callable para run_id={run_id}")
-
+# Geração de UC: "batch" (OpenAI Batch API, até 24h) ou "realtime" (chamadas concorrentes, para runs pequenas/médias)
+UC_GENERATION_MODES = ["batch", "realtime"]
+
+# Mesmo critério de str.isalnum() + "._" (mantém letras acentuadas), executado pelo motor de regex
+_FILENAME_SANITIZE_RE = re.compile(r"[^\w.]")
+
+_API_MAX_RETRIES = 3
+
+# Sessão compartilhada: reaproveita conexões com a API e refaz chamadas em falhas transitórias
+_SESSION = requests.Session()
+_API_ADAPTER = HTTPAdapter(
+    pool_maxsize=32,
+    max_retries=Retry(total=_API_MAX_RETRIES, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+)
+_SESSION.mount("http://", _API_ADAPTER)
+_SESSION.mount("https://", _API_ADAPTER)
+
+def _link_or_copy(src: Path, dst: Path):
+    """Cria um hardlink de src em dst (O(1)); se não for possível (ex.: outro filesystem), copia só o conteúdo."""
+    dst.unlink(missing_ok=True)
     try:
-        if isinstance(resource_ids_for_run_input, str):
-            actual_resource_ids_list = ast.literal_eval(resource_ids_for_run_input)
-        elif isinstance(resource_ids_for_run_input, list):
-            actual_resource_ids_list = resource_ids_for_run_input
-        else:
-            raise ValueError(f"Tipo inesperado para resource_ids_for_run_input: {type(resource_ids_for_run_input)}")
-
-        if not isinstance(actual_resource_ids_list, list):
-            raise ValueError(
-                f"resource_ids_for_run_input não pôde ser convertido para uma lista. Valor: {resource_ids_for_run_input}")
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def _resource_url(resource_id_str: str) -> str:
+    return f"{RESOURCES_API_URL}/{resource_id_str}"
+
+def _put_resource_status(resource_id_str: str, payload: Dict[str, Any]):
+    """PUT de status do recurso pela sessão compartilhada (o Retry do adapter cobre conexão e 502/503/504)."""
+    response = _SESSION.put(_resource_url(resource_id_str), json=payload, timeout=10)
+    response.raise_for_status()
+
+def _prepare_single_resource(resource_id_str: str, resource_data: Optional[Dict[str, Any]],
+                             run_specific_input_dir: Path):
+    """Converte um recurso para TXT (ou reaproveita o cache) e o copia para o input da run."""
+    logging.info(f"Processando resource_id: {resource_id_str}")
+    if not resource_id_str or not isinstance(resource_id_str, str):
+        logging.warning(f"Item inválido na lista de resource_ids: '{resource_id_str}'. Pulando.")
+        return
+    try:
+        if resource_data is None:
+            raise LookupError(f"Recurso {resource_id_str} não encontrado na API.")
+        logging.info(f"Detalhes do recurso {resource_id_str}: {resource_data}")
 
-    except (ValueError, SyntaxError) as e:
-        logging.error(f"Erro ao converter resource_ids_for_run_input ('{resource_ids_for_run_input}') para lista: {e}")
-        actual_resource_ids_list = []
+        original_file_path_relative = Path(resource_data["original_file_path"])
+        original_file_path_absolute = AIRFLOW_DATA_DIR_VOL / original_file_path_relative
 
-    if not actual_resource_ids_list:
-        logging.warning("Nenhum resource_id para processar após conversão/validação.")
-        return
+        processed_txt_path_relative_str = resource_data.get("processed_txt_path")
+        current_status = resource_data.get("status")
+        final_txt_to_copy_to_run_input = None
 
-    logging.info(f"Lista de resource_ids a processar: {actual_resource_ids_list}")
+        if processed_txt_path_relative_str and current_status == "processed_txt_success":
+            logging.info(f"Recurso {resource_id_str} já processado para TXT. Usando cache.")
+            final_txt_to_copy_to_run_input = AIRFLOW_DATA_DIR_VOL / Path(processed_txt_path_relative_str)
+        else:
+            logging.info(f"Recurso {resource_id_str} precisa ser convertido para TXT.")
+
+            processed_txt_filename = f"{resource_id_str}.txt"
+            target_processed_txt_path_relative = PROCESSED_TXT_DIR_RELATIVE / resource_id_str / processed_txt_filename
+            target_processed_txt_path_absolute = PROCESSED_TXT_DIR / resource_id_str / processed_txt_filename
+            (PROCESSED_TXT_DIR / resource_id_str).mkdir(parents=True, exist_ok=True)
+
+            if not original_file_path_absolute.exists():
+                raise FileNotFoundError(f"Arquivo original não encontrado em: {original_file_path_absolute}")
+
+            if resource_data[
+                "original_mime_type"] == "text/plain" or original_file_path_absolute.suffix.lower() == ".txt":
+                logging.info(
+                    f"Copiando arquivo TXT original: {original_file_path_absolute} para {target_processed_txt_path_absolute}")
+                _link_or_copy(original_file_path_absolute, target_processed_txt_path_absolute)
+            elif resource_data[
+                "original_mime_type"] == "application/pdf" or original_file_path_absolute.suffix.lower() == ".pdf":
+                # Só a conversão de PDF é lenta o bastante para justificar o status intermediário;
+                # falhar nesse PUT não falha o recurso.
+                try:
+                    _put_resource_status(resource_id_str, {"status": "processing_txt"})
+                except Exception as put_err:
+                    logging.warning(f"Falha ao marcar {resource_id_str} como processing_txt: {put_err}")
+                logging.info(
+                    f"Convertendo PDF: {original_file_path_absolute} para {target_processed_txt_path_absolute}")
+                convert_pdf_to_txt(original_file_path_absolute, target_processed_txt_path_absolute)
+            else:
+                raise ValueError(
+                    f"Tipo de arquivo não suportado para conversão: {resource_data['original_mime_type']}")
+
+            update_payload_success = {
+                "status": "processed_txt_success",
+                "processed_txt_path": str(target_processed_txt_path_relative)
+            }
+            _put_resource_status(resource_id_str, update_payload_success)
+            logging.info(f"Recurso {resource_id_str} convertido e status atualizado.")
+            final_txt_to_copy_to_run_input = target_processed_txt_path_absolute
+
+        if final_txt_to_copy_to_run_input and final_txt_to_copy_to_run_input.exists():
+            sanitized_original_filename = _FILENAME_SANITIZE_RE.sub("_", Path(resource_data["original_filename"]).stem)
+            destination_in_run_input = run_specific_input_dir / f"{sanitized_original_filename}.txt"
+            _link_or_copy(final_txt_to_copy_to_run_input, destination_in_run_input)
+            logging.info(f"Copiado {final_txt_to_copy_to_run_input} para {destination_in_run_input}")
+        else:
+            raise FileNotFoundError(
+                f"Arquivo TXT final não encontrado para cópia: {final_txt_to_copy_to_run_input}")
 
+    except Exception as e:
+        logging.error(f"Erro ao processar resource_id {resource_id_str}: {e}", exc_info=True)
+        try:
+            update_payload_error = {"status": "processed_txt_error", "error_message": str(e)[:1000]}
+            _put_resource_status(resource_id_str, update_payload_error)
+        except Exception as api_err:
+            logging.error(f"Falha ao atualizar status de erro para {resource_id_str} via API: {api_err}")
+        # Propaga a falha: a task mapeada falha e o retry/failure handling do Airflow se aplica
+        raise
+
+def _list_resource_ids_callable(run_id: str, resource_ids_for_run_input: List[str], **kwargs) -> List[Dict[str, Any]]:
+    """Valida a lista de resource_ids da run e gera os op_kwargs de cada task mapeada (um recurso cada)."""
+    # Com render_template_as_native_obj o template já chega como lista Python (e o id pode chegar como int)
+    run_id = str(run_id)
+    logging.info(f"Listando resource_ids para run_id={run_id}")
+
+    if not isinstance(resource_ids_for_run_input, list):
+        logging.error(f"Tipo inesperado para resource_ids_for_run_input: {type(resource_ids_for_run_input)}. "
+                      f"Valor: {resource_ids_for_run_input}")
+        return []
+
+    valid_resource_ids = []
+    for resource_id_str in resource_ids_for_run_input:
+        if not resource_id_str or not isinstance(resource_id_str, str):
+            logging.warning(f"Item inválido na lista de resource_ids: '{resource_id_str}'. Pulando.")
+            continue
+        valid_resource_ids.append(resource_id_str)
+
+    if not valid_resource_ids:
+        logging.warning("Nenhum resource_id para processar.")
+        return []
+    logging.info(f"Lista de resource_ids a processar: {valid_resource_ids}")
+
+    # Uma única chamada para os metadados de todos os recursos, em vez de um GET por recurso
+    response = _SESSION.get(RESOURCES_API_URL,
+                            params={"ids": ",".join(valid_resource_ids)}, timeout=10)
+    response.raise_for_status()
+    meta_by_id = {str(item["resource_id"]): item for item in response.json()}
+
+    return [
+        {"run_id": run_id,
+         "resource": {"resource_id_str": resource_id_str, "resource_data": meta_by_id.get(resource_id_str)}}
+        for resource_id_str in valid_resource_ids
+    ]
+
+def _prepare_input_files_callable(run_id: str, resource: Dict[str, Any], **kwargs):
     run_specific_input_dir = AIRFLOW_DATA_DIR_VOL / run_id / "input"
     run_specific_input_dir.mkdir(parents=True, exist_ok=True)
     logging.info(f"Diretório de input da run: {run_specific_input_dir}")
 
-    base_originals_dir = AIRFLOW_DATA_DIR_VOL / "uploads" / "originals"
-    base_processed_txt_dir = AIRFLOW_DATA_DIR_VOL / "uploads" / "processed_txt"
-    base_processed_txt_dir.mkdir(parents=True, exist_ok=True)
+    PROCESSED_TXT_DIR.mkdir(parents=True, exist_ok=True)
 
-    for resource_id_str in actual_resource_ids_list:
-        logging.info(f"Processando resource_id: {resource_id_str}")
-        if not resource_id_str or not isinstance(resource_id_str, str):
-            logging.warning(f"Item inválido na lista de resource_ids: '{resource_id_str}'. Pulando.")
-            continue
-        try:
-            res_details_url = f"{PIPELINE_API_BASE_URL}/api/v1/resources/{resource_id_str}"
-            response = requests.get(res_details_url, timeout=10)
-            response.raise_for_status()
-            resource_data = response.json()
-            logging.info(f"Detalhes do recurso {resource_id_str}: {resource_data}")
-
-            original_file_path_relative = Path(resource_data["original_file_path"])
-            original_file_path_absolute = AIRFLOW_DATA_DIR_VOL / original_file_path_relative
-
-            processed_txt_path_relative_str = resource_data.get("processed_txt_path")
-            current_status = resource_data.get("status")
-            final_txt_to_copy_to_run_input = None
-
-            if processed_txt_path_relative_str and current_status == "processed_txt_success":
-                logging.info(f"Recurso {resource_id_str} já processado para TXT. Usando cache.")
-                final_txt_to_copy_to_run_input = AIRFLOW_DATA_DIR_VOL / Path(processed_txt_path_relative_str)
-            else:
-                logging.info(f"Recurso {resource_id_str} precisa ser convertido para TXT.")
-                update_payload = {"status": "processing_txt"}
-                requests.put(f"{PIPELINE_API_BASE_URL}/api/v1/resources/{resource_id_str}", json=update_payload,
-                             timeout=5).raise_for_status()
-
-                processed_txt_filename = f"{resource_id_str}.txt"
-                target_processed_txt_path_relative = Path(
-                    "uploads") / "processed_txt" / resource_id_str / processed_txt_filename
-                target_processed_txt_path_absolute = base_processed_txt_dir / resource_id_str / processed_txt_filename
-                (base_processed_txt_dir / resource_id_str).mkdir(parents=True, exist_ok=True)
-
-                if not original_file_path_absolute.exists():
-                    raise FileNotFoundError(f"Arquivo original não encontrado em: {original_file_path_absolute}")
-
-                if resource_data[
-                    "original_mime_type"] == "text/plain" or original_file_path_absolute.suffix.lower() == ".txt":
-                    logging.info(
-                        f"Copiando arquivo TXT original: {original_file_path_absolute} para {target_processed_txt_path_absolute}")
-                    shutil.copy(original_file_path_absolute, target_processed_txt_path_absolute)
-                elif resource_data[
-                    "original_mime_type"] == "application/pdf" or original_file_path_absolute.suffix.lower() == ".pdf":
-                    logging.info(
-                        f"Convertendo PDF: {original_file_path_absolute} para {target_processed_txt_path_absolute}")
-                    pdf_doc = pdfium.PdfDocument(original_file_path_absolute)
-                    text_content = ""
-                    for i in range(len(pdf_doc)):
-                        page = pdf_doc[i]
-                        textpage = page.get_textpage()
-                        text_content += textpage.get_text_range() + "\n"
-                        textpage.close()
-                        page.close()
-                    pdf_doc.close()
-                    with open(target_processed_txt_path_absolute, "w", encoding="utf-8") as f_out:
-                        f_out.write(text_content)
-                else:
-                    raise ValueError(
-                        f"Tipo de arquivo não suportado para conversão: {resource_data['original_mime_type']}")
-
-                update_payload_success = {
-                    "status": "processed_txt_success",
-                    "processed_txt_path": str(target_processed_txt_path_relative)
-                }
-                requests.put(f"{PIPELINE_API_BASE_URL}/api/v1/resources/{resource_id_str}", json=update_payload_success,
-                             timeout=5).raise_for_status()
-                logging.info(f"Recurso {resource_id_str} convertido e status atualizado.")
-                final_txt_to_copy_to_run_input = target_processed_txt_path_absolute
-
-            if final_txt_to_copy_to_run_input and final_txt_to_copy_to_run_input.exists():
-                sanitized_original_filename = "".join(
-                    c if c.isalnum() or c in ('.', '_') else '_' for c in Path(resource_data["original_filename"]).stem)
-                destination_in_run_input = run_specific_input_dir / f"{sanitized_original_filename}.txt"
-                shutil.copy(final_txt_to_copy_to_run_input, destination_in_run_input)
-                logging.info(f"Copiado {final_txt_to_copy_to_run_input} para {destination_in_run_input}")
-            else:
-                raise FileNotFoundError(
-                    f"Arquivo TXT final não encontrado para cópia: {final_txt_to_copy_to_run_input}")
-
-        except Exception as e:
-            logging.error(f"Erro ao processar resource_id {resource_id_str}: {e}", exc_info=True)
-            try:
-                update_payload_error = {"status": "processed_txt_error", "error_message": str(e)[:1000]}
-                requests.put(f"{PIPELINE_API_BASE_URL}/api/v1/resources/{resource_id_str}", json=update_payload_error,
-                             timeout=5)
-            except Exception as api_err:
-                logging.error(f"Falha ao atualizar status de erro para {resource_id_str} via API: {api_err}")
+    _prepare_single_resource(resource["resource_id_str"], resource["resource_data"], run_specific_input_dir)
 
 def _skip_or_run_graphrag(**kwargs):
     dag_run = kwargs.get('dag_run')
@@ -156,34 +204,56 @@ def _skip_or_run_graphrag(**kwargs):
         return "skip_graphrag"
     return "graphrag_index"
 
+def _choose_uc_generation_mode(**kwargs):
+    params = kwargs.get('params') or {}
+    if params.get('uc_generation_mode') == "realtime":
+        return "generation_realtime"
+    return "generation_batch"
+
 
 with DAG(
         dag_id="knowledge_graph_pipeline",
         schedule=None,
         start_date=pendulum.datetime(2024, 5, 24, tz="UTC"),
         catchup=False,
+        render_template_as_native_obj=True,
         tags=["knowledge_graph", "llm", "batch_api_v2"],
-        params={'identifier': "{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}"},
+        params={
+            'identifier': PIPELINE_ID_TEMPLATE,
+            'uc_generation_mode': Param("batch", type="string", enum=UC_GENERATION_MODES),
+        },
         doc_md="""
     ### Knowledge Graph Pipeline DAG (v2 - Database Managed Batches)
     Orquestra a geração de um grafo de conhecimento educacional a partir de outputs do GraphRAG,
     utilizando a OpenAI Batch API para geração de UCs e avaliação de dificuldade.
     O estado dos jobs de batch (submissão, status LLM, processamento de resultados) é gerenciado
     pela API e persistido no banco de dados.
+    Com o param `uc_generation_mode="realtime"` a geração de UCs dispensa a Batch API e roda
+    com chamadas concorrentes, útil para runs pequenas/médias.
     """,
 ) as dag:
-    prepare_input_files = PythonOperator(
-        task_id="prepare_input_files",
-        python_callable=_prepare_input_files_callable,
+    list_resource_ids = PythonOperator(
+        task_id="list_resource_ids",
+        python_callable=_list_resource_ids_callable,
         op_kwargs={
-            "run_id": "{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}",
+            "run_id": PIPELINE_ID_TEMPLATE,
             "resource_ids_for_run_input": "{{ dag_run.conf.get('resource_ids_for_run', []) }}",
         },
     )
 
+    # Uma task mapeada por recurso: retries isolados e paralelismo controlado pelo scheduler
+    prepare_input_files = PythonOperator.partial(
+        task_id="prepare_input_files",
+        python_callable=_prepare_input_files_callable,
+        queue=PDF_EXTRACT_QUEUE,
+        max_active_tis_per_dag=16,
+    ).expand(op_kwargs=list_resource_ids.output)
+
     branch_graphrag = BranchPythonOperator(
         task_id="branch_graphrag",
         python_callable=_skip_or_run_graphrag,
+        # Sem recursos o mapeamento fica vazio (skipped); o pipeline segue como antes
+        trigger_rule=TriggerRule.NONE_FAILED,
     )
 
     skip_graphrag = EmptyOperator(
@@ -204,7 +274,7 @@ with DAG(
             "GRAPHRAG_MODEL": os.getenv("GRAPHRAG_MODEL"),
             "GRAPHRAG_API_KEY": os.getenv("GRAPHRAG_API_KEY"),
             "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY"),
-            "GRAPHRAG_RUN_ID": "{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}",
+            "GRAPHRAG_RUN_ID": PIPELINE_ID_TEMPLATE,
         },
     )
 
@@ -212,38 +282,39 @@ with DAG(
         task_id="prepare_origins",
         http_conn_id=PIPELINE_API_CONN_ID,
         method="POST",
-        endpoint="/pipeline/{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}/prepare-origins",
+        endpoint=f"/pipeline/{PIPELINE_ID_TEMPLATE}/prepare-origins",
         headers={"Content-Type": "application/json"},
         do_xcom_push=False,
+        # Necessário por causa do branch_graphrag: um dos dois upstreams sempre fica skipped.
+        # Demais tasks usam o padrão all_success, exceto define_relationships (branch_uc_generation);
+        # evite novos branches sem revisar estas regras.
         trigger_rule=TriggerRule.ONE_SUCCESS,
     )
 
-    submit_generation_batch = SimpleHttpOperator(
-        task_id="submit_generation_batch",
+    # Deferrable: a espera pelo batch roda no triggerer, sem ocupar slot de worker (poke) nem
+    # recriar a TI a cada consulta (reschedule); o intervalo cresce de 30s até 15min.
+    generation_batch = OpenAIBatchOperator(
+        task_id="generation_batch",
         http_conn_id=PIPELINE_API_CONN_ID,
-        method="POST",
-        endpoint=f"/pipeline/{{{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}}}/submit-batch/{BATCH_TYPE_UC_GENERATION}",
-        headers={"Content-Type": "application/json"},
-        do_xcom_push=False,
+        pipeline_id=PIPELINE_ID_TEMPLATE,
+        batch_type=BATCH_TYPE_UC_GENERATION,
+        poke_interval=30,
+        exponential_backoff=True,
+        max_wait=timedelta(minutes=15),
+        timeout=timedelta(hours=1),
     )
 
-    wait_generation_batch_completion = HttpSensor(
-        task_id="wait_generation_batch_completion",
-        http_conn_id=PIPELINE_API_CONN_ID,
-        method="GET",
-        endpoint=f"/pipeline/{{{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}}}/batch-job-status/{BATCH_TYPE_UC_GENERATION}",
-        request_params={},
-        response_check=lambda response: response.json().get("llm_status") == "completed",
-        poke_interval=60,
-        timeout=3600,
-        mode="reschedule",
+    branch_uc_generation = BranchPythonOperator(
+        task_id="branch_uc_generation",
+        python_callable=_choose_uc_generation_mode,
     )
 
-    process_generation_batch_results = SimpleHttpOperator(
-        task_id="process_generation_batch_results",
+    # Sem Batch API: a API executa os requests concorrentemente e já salva os resultados
+    generation_realtime = SimpleHttpOperator(
+        task_id="generation_realtime",
         http_conn_id=PIPELINE_API_CONN_ID,
         method="POST",
-        endpoint=f"/pipeline/{{{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}}}/process-batch-results/{BATCH_TYPE_UC_GENERATION}",
+        endpoint=f"/pipeline/{PIPELINE_ID_TEMPLATE}/run-realtime/{BATCH_TYPE_UC_GENERATION}",
         headers={"Content-Type": "application/json"},
         do_xcom_push=False,
     )
@@ -252,66 +323,42 @@ with DAG(
         task_id="define_relationships",
         http_conn_id=PIPELINE_API_CONN_ID,
         method="POST",
-        endpoint="/pipeline/{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}/define-relationships",
+        endpoint=f"/pipeline/{PIPELINE_ID_TEMPLATE}/define-relationships",
         headers={"Content-Type": "application/json"},
         do_xcom_push=False,
+        # Por causa do branch_uc_generation um dos dois caminhos de geração sempre fica skipped
+        trigger_rule=TriggerRule.NONE_FAILED_MIN_ONE_SUCCESS,
     )
 
-    submit_difficulty_batch = SimpleHttpOperator(
-        task_id="submit_difficulty_batch",
+    difficulty_batch = OpenAIBatchOperator(
+        task_id="difficulty_batch",
         http_conn_id=PIPELINE_API_CONN_ID,
-        method="POST",
-        endpoint=f"/pipeline/{{{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}}}/submit-batch/{BATCH_TYPE_DIFFICULTY_ASSESSMENT}",
-        headers={"Content-Type": "application/json"},
-        do_xcom_push=False,
-    )
-
-    wait_difficulty_batch_completion = HttpSensor(
-        task_id="wait_difficulty_batch_completion",
-        http_conn_id=PIPELINE_API_CONN_ID,
-        method="GET",
-        endpoint=f"/pipeline/{{{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}}}/batch-job-status/{BATCH_TYPE_DIFFICULTY_ASSESSMENT}",
-        request_params={},
-        response_check=lambda response: response.json().get("llm_status") == "completed",
-        poke_interval=60,
-        timeout=3600,
-        mode="reschedule",
-    )
-
-    process_difficulty_batch_results = SimpleHttpOperator(
-        task_id="process_difficulty_batch_results",
-        http_conn_id=PIPELINE_API_CONN_ID,
-        method="POST",
-        endpoint=f"/pipeline/{{{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}}}/process-batch-results/{BATCH_TYPE_DIFFICULTY_ASSESSMENT}",
-        headers={"Content-Type": "application/json"},
-        do_xcom_push=False,
+        pipeline_id=PIPELINE_ID_TEMPLATE,
+        batch_type=BATCH_TYPE_DIFFICULTY_ASSESSMENT,
+        poke_interval=30,
+        exponential_backoff=True,
+        max_wait=timedelta(minutes=15),
+        timeout=timedelta(hours=1),
     )
 
     finalize_outputs = SimpleHttpOperator(
         task_id="finalize_outputs",
         http_conn_id=PIPELINE_API_CONN_ID,
         method="POST",
-        endpoint="/pipeline/{{ dag_run.conf.get('pipeline_id', dag_run.run_id) }}/finalize-outputs",
+        endpoint=f"/pipeline/{PIPELINE_ID_TEMPLATE}/finalize-outputs",
         headers={"Content-Type": "application/json"},
         do_xcom_push=False,
     )
 
     # Definindo as dependências do pipeline
-    prepare_input_files >> branch_graphrag
+    list_resource_ids >> prepare_input_files >> branch_graphrag
     branch_graphrag >> [graphrag_index, skip_graphrag]
 
     # prepare_origins depende da conclusão de graphrag_index ou skip_graphrag
     graphrag_index >> prepare_origins
     skip_graphrag >> prepare_origins
 
-    prepare_origins >> submit_generation_batch
-    submit_generation_batch >> wait_generation_batch_completion
-    wait_generation_batch_completion >> process_generation_batch_results
-
-    process_generation_batch_results >> define_relationships
-
-    define_relationships >> submit_difficulty_batch
-    submit_difficulty_batch >> wait_difficulty_batch_completion
-    wait_difficulty_batch_completion >> process_difficulty_batch_results
+    prepare_origins >> branch_uc_generation >> [generation_batch, generation_realtime]
+    [generation_batch, generation_realtime] >> define_relationships
 
-    process_difficulty_batch_results >> finalize_outputs
\ No newline at end of file
+    define_relationships >> difficulty_batch >> finalize_outputs
\ No newline at end of file
@@ -0,0 +1,185 @@
+# plugins/batch_job_operators.py
+"""
+Operadores e triggers para acompanhar os batch jobs LLM gerenciados pela Pipeline API.
+
+O trigger roda no processo triggerer (loop asyncio), então o worker fica livre
+enquanto o batch da OpenAI está em andamento.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import aiohttp
+from airflow.exceptions import AirflowException
+from airflow.models.baseoperator import BaseOperator
+from airflow.providers.http.hooks.http import HttpHook
+from airflow.triggers.base import BaseTrigger, TriggerEvent
+
+LLM_STATUS_COMPLETED = "completed"
+LLM_TERMINAL_FAILURE_STATUSES = {"failed", "cancelled", "expired"}
+
+
+class BatchJobStatusTrigger(BaseTrigger):
+    """Consulta o endpoint batch-job-status da API até o batch LLM terminar."""
+
+    def __init__(
+            self,
+            url: str,
+            poke_interval: float = 60.0,
+            exponential_backoff: bool = False,
+            max_poke_interval: Optional[float] = None,
+            request_timeout: float = 30.0,
+            jitter: float = 0.0,
+    ):
+        super().__init__()
+        self.url = url
+        self.poke_interval = poke_interval
+        self.exponential_backoff = exponential_backoff
+        self.max_poke_interval = max_poke_interval
+        self.request_timeout = request_timeout
+        self.jitter = jitter
+
+    def serialize(self) -> Tuple[str, Dict[str, Any]]:
+        return (
+            "batch_job_operators.BatchJobStatusTrigger",
+            {
+                "url": self.url,
+                "poke_interval": self.poke_interval,
+                "exponential_backoff": self.exponential_backoff,
+                "max_poke_interval": self.max_poke_interval,
+                "request_timeout": self.request_timeout,
+                "jitter": self.jitter,
+            },
+        )
+
+    async def run(self) -> AsyncIterator[TriggerEvent]:
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            try_number = 1
+            while True:
+                payload = await self._fetch_status(session)
+                llm_status = payload.get("llm_status") if payload else None
+
+                if llm_status == LLM_STATUS_COMPLETED:
+                    yield TriggerEvent({"status": "success", "payload": payload})
+                    return
+                if llm_status in LLM_TERMINAL_FAILURE_STATUSES:
+                    yield TriggerEvent({"status": "error", "payload": payload})
+                    return
+
+                interval = self._next_interval(try_number)
+                self.log.info("Batch ainda não concluído (llm_status=%s). Nova consulta em %ss.",
+                              llm_status, interval)
+                await asyncio.sleep(interval)
+                try_number += 1
+
+    def _next_interval(self, try_number: int) -> float:
+        """
+        Intervalo até a próxima consulta: fixo ou poke_interval * 2**(try_number-1), limitado por max_poke_interval,
+        variando +/- jitter (fração) para que triggers de vários DAG runs não consultem a API em sincronia.
+        """
+        interval = self.poke_interval
+        if self.exponential_backoff:
+            interval = self.poke_interval * 2 ** (try_number - 1)
+            if self.max_poke_interval is not None:
+                interval = min(interval, self.max_poke_interval)
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def _fetch_status(self, session: aiohttp.ClientSession) -> Optional[Dict[str, Any]]:
+        try:
+            async with session.get(self.url) as response:
+                if response.status == 404:
+                    self.log.info("Batch job ainda não encontrado em %s.", self.url)
+                    return None
+                response.raise_for_status()
+                return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.log.warning("Falha ao consultar status do batch em %s: %s", self.url, e)
+            return None
+
+
+class OpenAIBatchOperator(BaseOperator):
+    """
+    Executa um batch LLM completo em uma única task: submete o batch, aguarda a
+    conclusão via BatchJobStatusTrigger (deferrable) e processa os resultados.
+    Os endpoints de submit e process da API são idempotentes, então retries são seguros.
+    """
+
+    template_fields = ("pipeline_id",)
+
+    def __init__(
+            self,
+            *,
+            pipeline_id: str,
+            batch_type: str,
+            http_conn_id: str,
+            poke_interval: float = 30.0,
+            exponential_backoff: bool = True,
+            max_wait: Optional[timedelta] = None,
+            timeout: timedelta = timedelta(hours=1),
+            poke_jitter: float = 0.2,
+            **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.pipeline_id = pipeline_id
+        self.batch_type = batch_type
+        self.http_conn_id = http_conn_id
+        self.poke_interval = poke_interval
+        self.exponential_backoff = exponential_backoff
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.poke_jitter = poke_jitter
+
+    def _endpoint(self, action: str) -> str:
+        return f"/pipeline/{self.pipeline_id}/{action}/{self.batch_type}"
+
+    def _post(self, action: str) -> Dict[str, Any]:
+        hook = HttpHook(method="POST", http_conn_id=self.http_conn_id)
+        response = hook.run(self._endpoint(action), headers={"Content-Type": "application/json"})
+        return response.json()
+
+    def _is_completed(self) -> bool:
+        hook = HttpHook(method="GET", http_conn_id=self.http_conn_id)
+        try:
+            response = hook.run(self._endpoint("batch-job-status"))
+        except AirflowException as e:
+            if str(e).startswith("404"):
+                return False
+            raise
+        return response.json().get("llm_status") == LLM_STATUS_COMPLETED
+
+    def execute(self, context) -> None:
+        submit_result = self._post("submit-batch")
+        self.log.info("Submissão do batch %s: %s", self.batch_type, submit_result)
+
+        if self._is_completed():
+            self.log.info("Batch %s já concluído. Sem necessidade de defer.", self.batch_type)
+            self._process_results()
+            return
+
+        hook = HttpHook(method="GET", http_conn_id=self.http_conn_id)
+        hook.get_conn()
+        self.defer(
+            trigger=BatchJobStatusTrigger(
+                url=hook.url_from_endpoint(self._endpoint("batch-job-status")),
+                poke_interval=self.poke_interval,
+                exponential_backoff=self.exponential_backoff,
+                max_poke_interval=self.max_wait.total_seconds() if self.max_wait else None,
+                jitter=self.poke_jitter,
+            ),
+            method_name="execute_complete",
+            timeout=self.timeout,
+        )
+
+    def execute_complete(self, context, event: Optional[Dict[str, Any]] = None) -> None:
+        if not event or event.get("status") != "success":
+            raise AirflowException(f"Batch job {self.batch_type} não concluído com sucesso: {event}")
+        self.log.info("Batch %s concluído: %s", self.batch_type, event.get("payload"))
+        self._process_results()
+
+    def _process_results(self) -> None:
+        process_result = self._post("process-batch-results")
+        self.log.info("Processamento dos resultados do batch %s: %s", self.batch_type, process_result)
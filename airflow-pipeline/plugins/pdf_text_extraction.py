@@ -0,0 +1,81 @@
+# plugins/pdf_text_extraction.py
+"""
+Extração de texto de PDFs usada na preparação dos inputs do pipeline (PyMuPDF, se
+instalado, com PDFium como fallback).
+
+Nem PDFium nem MuPDF são thread-safe: conversões dentro do mesmo processo são serializadas.
+O paralelismo entre documentos vem das tasks mapeadas da DAG (uma por recurso).
+"""
+import gc
+import logging
+import threading
+from contextlib import closing
+from pathlib import Path
+
+# A cada N páginas força a coleta de objetos nativos pendentes. RSS máximo esperado por documento:
+# arquivo PDF mapeado em memória + ~N páginas de texto.
+GC_EVERY_N_PAGES = 64
+
+_PDF_LOCK = threading.Lock()
+
+
+def _page_text(pdf_doc, index: int) -> str:
+    """Extrai o texto de uma página liberando page/textpage nativos imediatamente, mesmo em caso de erro."""
+    page = pdf_doc[index]
+    try:
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range()
+        finally:
+            textpage.close()
+    finally:
+        page.close()
+
+
+def _write_pages_sequential(pdf_path: Path, txt_path: Path) -> None:
+    import pypdfium2 as pdfium
+
+    # Escreve página a página para não acumular o texto inteiro em memória
+    with closing(pdfium.PdfDocument(pdf_path)) as pdf_doc, \
+            open(txt_path, "w", encoding="utf-8", buffering=1 << 20) as f_out:
+        for i in range(len(pdf_doc)):
+            f_out.write(_page_text(pdf_doc, i))
+            f_out.write("\n")
+            if (i + 1) % GC_EVERY_N_PAGES == 0:
+                gc.collect()
+
+
+def _import_pymupdf():
+    """PyMuPDF é opcional: retorna o módulo se instalado, senão None (usa-se o PDFium)."""
+    try:
+        import pymupdf
+    except ImportError:
+        try:
+            import fitz as pymupdf  # nome do pacote em versões antigas
+        except ImportError:
+            return None
+    return pymupdf
+
+
+def _write_pages_pymupdf(pymupdf, pdf_path: Path, txt_path: Path) -> None:
+    with pymupdf.open(str(pdf_path)) as pdf_doc, \
+            open(txt_path, "w", encoding="utf-8", buffering=1 << 20) as f_out:
+        for page in pdf_doc:
+            f_out.write(page.get_text("text"))
+            f_out.write("\n")
+
+
+def convert_pdf_to_txt(pdf_path: Path, txt_path: Path) -> None:
+    """
+    Converte pdf_path em txt_path, com o texto de cada página seguido de uma quebra de linha.
+    Usa PyMuPDF quando instalado (extração bem mais rápida) e PDFium como fallback.
+    """
+    with _PDF_LOCK:
+        pymupdf = _import_pymupdf()
+        if pymupdf is not None:
+            try:
+                _write_pages_pymupdf(pymupdf, pdf_path, txt_path)
+                return
+            except Exception as e:
+                logging.warning(f"PyMuPDF falhou ao extrair {pdf_path} ({e}). Usando PDFium.")
+        _write_pages_sequential(pdf_path, txt_path)
@@ -0,0 +1,32 @@
+"""widen pipeline_batch_jobs.llm_batch_id to hold several sharded batch ids
+
+Revision ID: 0009_batch_job_shards
+Revises: 0008_pipeline_batch
+Create Date: 2026-10-17 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0009_batch_job_shards'
+down_revision = '0008_pipeline_batch'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.alter_column(
+        'pipeline_batch_jobs',
+        'llm_batch_id',
+        existing_type=sa.String(length=255),
+        type_=sa.Text(),
+        existing_nullable=True,
+    )
+
+def downgrade():
+    op.alter_column(
+        'pipeline_batch_jobs',
+        'llm_batch_id',
+        existing_type=sa.Text(),
+        type_=sa.String(length=255),
+        existing_nullable=True,
+    )
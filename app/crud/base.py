@@ -27,4 +27,19 @@ def add_records(db: Session, model: Type, run_id: str, records: list) -> None:
     pk_cols = [col.name for col in model.__table__.primary_key.columns]
     stmt = stmt.on_conflict_do_nothing(index_elements=pk_cols)
 
-    db.execute(stmt)
\ No newline at end of file
+    db.execute(stmt)
+
+
+def query_columns(db: Session, model: Type, run_id: str, columns: list[str]) -> list[dict]:
+    """
+    Select only the given columns of the model for a given run_id.
+    Column names are validated against the model's table; unknown names raise ValueError.
+    """
+    table_columns = model.__table__.columns
+    unknown = [col for col in columns if col not in table_columns]
+    if unknown:
+        raise ValueError(f"Unknown columns for {model.__tablename__}: {unknown}")
+    rows = db.query(*(table_columns[col] for col in columns)).filter(
+        model.pipeline_run_id == run_id
+    ).all()
+    return [dict(zip(columns, row)) for row in rows]
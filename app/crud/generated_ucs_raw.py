@@ -1,14 +1,21 @@
 """CRUD operations for generated_ucs_raw table."""
+from typing import Optional
 from sqlalchemy.orm import Session
 import app.models as models
-from app.crud.base import add_records
+from app.crud.base import add_records, query_columns
 
 def add_generated_ucs_raw(db: Session, run_id: str, records: list) -> None:
     """Insert generated UC raw records for a given pipeline run."""
     add_records(db, models.GeneratedUcsRaw, run_id, records)
 
-def get_generated_ucs_raw(db: Session, run_id: str) -> list[dict]:
-    """Return list of generated UC raw records for given pipeline run."""
+def get_generated_ucs_raw(db: Session, run_id: str, columns: Optional[list[str]] = None) -> list[dict]:
+    """
+    Return list of generated UC raw records for given pipeline run.
+    If columns is given, only those columns are returned.
+    """
+    if columns:
+        return query_columns(db, models.GeneratedUcsRaw, run_id, columns)
+
     rows = db.query(models.GeneratedUcsRaw).filter(
         models.GeneratedUcsRaw.pipeline_run_id == run_id
     ).all()
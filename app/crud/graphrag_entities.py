@@ -1,14 +1,21 @@
 """CRUD operations for entities table."""
+from typing import Optional
 from sqlalchemy.orm import Session
 import app.models as models
-from app.crud.base import add_records
+from app.crud.base import add_records, query_columns
 
 def add_entities(db: Session, run_id: str, records: list) -> None:
     """Insert entity records for a given pipeline run."""
     add_records(db, models.GraphragEntity, run_id, records)
     
-def get_entities(db: Session, run_id: str) -> list[dict]:
-    """Return list of entity records for given pipeline run."""
+def get_entities(db: Session, run_id: str, columns: Optional[list[str]] = None) -> list[dict]:
+    """
+    Return list of entity records for given pipeline run.
+    If columns is given, only those columns are returned.
+    """
+    if columns:
+        return query_columns(db, models.GraphragEntity, run_id, columns)
+
     rows = db.query(models.GraphragEntity).filter(
         models.GraphragEntity.pipeline_run_id == run_id
     ).all()
@@ -1,7 +1,8 @@
 """
 Entry point for the Pipeline API server.
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Path as FastAPIPath
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Query, Path as FastAPIPath
+from typing import List
 
 from app.scripts.pipeline_stages.task_define_relationships import task_define_relationships
 from app.scripts.pipeline_stages.task_finalize_outputs import task_finalize_outputs
@@ -10,6 +11,7 @@ from app.scripts.pipeline_stages.task_process_difficulty_batch import task_proce
 from app.scripts.pipeline_stages.task_process_uc_generation_batch import task_process_uc_generation_batch
 from app.scripts.pipeline_stages.task_submit_difficulty_batch import task_submit_difficulty_batch
 from app.scripts.pipeline_stages.task_submit_uc_generation_batch import task_submit_uc_generation_batch
+from app.scripts.pipeline_stages.task_run_uc_generation_async import task_run_uc_generation_async
 
 import app.scripts.batch_utils as batch_utils
 from app.scripts.llm_client import get_llm_strategy
@@ -28,9 +30,13 @@ import app.crud.pipeline_run_resource as crud_pipeline_run_resource
 import app.crud.pipeline_batch_job as crud_batch_jobs
 import uuid
 import logging
+from datetime import datetime, timedelta, timezone
 
 UPLOADS_ORIGINALS_DIR = Path(os.getenv("AIRFLOW_DATA_DIR", "./data")) / "uploads" / "originals"
 PROCESSED_TXT_DIR = Path(os.getenv("AIRFLOW_DATA_DIR", "./data")) / "uploads" / "processed_txt"
+UPLOAD_COPY_BUFSIZE = 1024 * 1024  # 1 MiB: menos syscalls que o padrão de 64 KiB para PDFs grandes
+# Job em PROCESSING sem atualização há mais que isso é considerado órfão (worker caiu/timeout) e pode ser reexecutado
+REALTIME_JOB_STALE_MINUTES = int(os.getenv("REALTIME_JOB_STALE_MINUTES", 60))
 
 BATCH_TYPE_UC_GENERATION = "uc_generation"
 BATCH_TYPE_DIFFICULTY_ASSESSMENT = "difficulty_assessment"
@@ -175,6 +181,95 @@ def submit_llm_batch(
                 logging.error(f"Additionally failed to update job status to SUBMISSION_FAILED for job_id {job_record.id}: {db_err}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to submit batch job: {e}")
 
+@app.post("/pipeline/{run_id}/run-realtime/{batch_type}", tags=["pipeline_batch_jobs"])
+def run_llm_realtime(
+    run_id: str,
+    batch_type: str = FastAPIPath(..., description=f"Type of job to run without the Batch API. Valid types: {[BATCH_TYPE_UC_GENERATION]}"),
+    db: Session = Depends(get_db)
+):
+    """
+    Runs the LLM requests of the given type concurrently (no Batch API) and processes the
+    responses in the same call. Shares the batch job record with submit-batch, so a run
+    completed either way is not executed again; a job still in flight returns 409, unless it
+    has been PROCESSING for longer than REALTIME_JOB_STALE_MINUTES.
+    """
+    if batch_type != BATCH_TYPE_UC_GENERATION:
+        raise HTTPException(status_code=400, detail=f"Real-time execution is only supported for batch_type '{BATCH_TYPE_UC_GENERATION}'.")
+
+    db_run = crud_runs.get_run(db, run_id)
+    if not db_run:
+        raise HTTPException(status_code=404, detail=f"Pipeline run '{run_id}' not found.")
+
+    job_record = crud_batch_jobs.create_or_get_pipeline_batch_job(
+        db,
+        pipeline_run_id=run_id,
+        batch_type=batch_type,
+        initial_status=crud_batch_jobs.STATUS_PENDING_SUBMISSION
+    )
+    db.flush()
+
+    if job_record.status == crud_batch_jobs.STATUS_COMPLETED:
+        logging.info(f"Job (id: {job_record.id}, type: {batch_type}, run: {run_id}) already completed. Skipping real-time run.")
+        return {
+            "status": "skipped_already_completed",
+            "message": f"Job already in status {job_record.status}.",
+            "pipeline_run_id": run_id,
+            "batch_type": batch_type,
+            "job_id": job_record.id,
+            "llm_batch_id": job_record.llm_batch_id
+        }
+
+    stale_before = datetime.now(timezone.utc) - timedelta(minutes=REALTIME_JOB_STALE_MINUTES)
+    if job_record.status == crud_batch_jobs.STATUS_PROCESSING and job_record.updated_at < stale_before:
+        # Execução anterior morreu sem registrar o resultado (nada foi commitado): pode rodar de novo
+        logging.warning(
+            f"Job (id: {job_record.id}, type: {batch_type}, run: {run_id}) stuck in {job_record.status} since "
+            f"{job_record.updated_at}. Treating it as stale and running again.")
+    elif job_record.status != crud_batch_jobs.STATUS_PENDING_SUBMISSION:
+        # Em andamento (outra execução ou caminho via Batch API): falha para o retry do Airflow tentar depois
+        error_detail_msg = (f"Job_id {job_record.id} is in status '{job_record.status}'. "
+                            f"Expected '{crud_batch_jobs.STATUS_PENDING_SUBMISSION}' to run in real time.")
+        logging.warning(error_detail_msg)
+        raise HTTPException(status_code=409, detail=error_detail_msg)  # 409 Conflict
+
+    crud_batch_jobs.update_pipeline_batch_job(db, job_id=job_record.id, status=crud_batch_jobs.STATUS_PROCESSING)
+    db.commit()
+
+    try:
+        realtime_id = task_run_uc_generation_async(run_id, db_session_from_api=db)
+        crud_batch_jobs.update_pipeline_batch_job(
+            db,
+            job_id=job_record.id,
+            status=crud_batch_jobs.STATUS_COMPLETED,
+            llm_batch_id=realtime_id,
+            last_error=None if realtime_id else "No data to submit to LLM."
+        )
+        db.commit()
+        logging.info(f"Real-time job (id: {job_record.id}, type: {batch_type}, run: {run_id}) completed. Run ID: {realtime_id}")
+        return {
+            "status": "success_processed" if realtime_id else "completed_no_data",
+            "message": "Real-time LLM requests completed and results saved." if realtime_id else "No data was available to send to the LLM.",
+            "pipeline_run_id": run_id,
+            "batch_type": batch_type,
+            "job_id": job_record.id,
+            "llm_batch_id": realtime_id
+        }
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Error running real-time job (type: {batch_type}, run: {run_id}): {e}", exc_info=True)
+        try:
+            with get_session() as error_db:
+                crud_batch_jobs.update_pipeline_batch_job(
+                    error_db,
+                    job_id=job_record.id,
+                    status=crud_batch_jobs.STATUS_PROCESSING_FAILED,
+                    last_error=str(e)[:1023]
+                )
+                error_db.commit()
+        except Exception as db_err:
+            logging.error(f"Additionally failed to update job status to PROCESSING_FAILED for job_id {job_record.id}: {db_err}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to run real-time job: {e}")
+
 @app.post("/pipeline/{run_id}/define-relationships", tags=["pipeline"])
 def define_relationships(run_id: str):
     """Endpoint para executar task_define_relationships em contexto de run_id."""
@@ -235,7 +330,7 @@ def get_llm_batch_job_status(
 
     if job_record.status == crud_batch_jobs.STATUS_SUBMITTED:
         try:
-            llm_status, output_file_id, error_file_id = batch_utils.check_batch_status(job_record.llm_batch_id)
+            llm_status, output_file_id, error_file_id = batch_utils.check_batch_group_status(job_record.llm_batch_id)
 
             current_internal_status = job_record.status
             new_internal_status = None
@@ -367,6 +462,9 @@ def process_llm_batch_results(
                 "job_id": job_record.id
             }
         else:
+            # Descarta os registros já gravados na sessão (flushes parciais/shards anteriores):
+            # um job com falha não deixa linhas para trás e o retry reprocessa do zero
+            db.rollback()
             crud_batch_jobs.update_pipeline_batch_job(db, job_id=job_record.id,
                                                       status=crud_batch_jobs.STATUS_PROCESSING_FAILED,
                                                       last_error="Processing logic returned failure.")
@@ -429,7 +527,7 @@ async def upload_resource(
 
     try:
         with open(absolute_original_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            shutil.copyfileobj(file.file, buffer, length=UPLOAD_COPY_BUFSIZE)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Não foi possível salvar o arquivo: {e}")
     finally:
@@ -450,6 +548,19 @@ async def upload_resource(
             logging.error(f"Erro de banco de dados ao criar recurso: {e_db}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"Erro de banco de dados ao criar recurso: {e_db}")
 
+@app.get("/api/v1/resources", response_model=List[schemas.ResourceResponse], tags=["resources"])
+def get_resources_details(
+    ids: str = Query(..., description="resource_ids separados por vírgula")
+):
+    """Retorna os detalhes de vários recursos em uma única chamada (ids ausentes são omitidos)."""
+    try:
+        resource_ids = [uuid.UUID(rid.strip()) for rid in ids.split(",") if rid.strip()]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"resource_id inválido: {e}")
+
+    with get_session() as db:
+        return crud_resource.get_resources_by_ids(db, resource_ids)
+
 @app.get("/api/v1/resources/{resource_id}", response_model=schemas.ResourceResponse, tags=["resources"])
 def get_resource_details(
     resource_id: uuid.UUID
@@ -247,7 +247,7 @@ class PipelineBatchJob(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     pipeline_run_id = Column(String, ForeignKey('pipeline_runs.run_id', ondelete='CASCADE'), nullable=False, index=True)
     batch_type = Column(String(50), nullable=False)
-    llm_batch_id = Column(String(255), nullable=True)
+    llm_batch_id = Column(Text, nullable=True)  # um ou mais batch ids do provedor, separados por vírgula
     status = Column(String(50), nullable=False, index=True)
     # PENDING_SUBMISSION, SUBMITTED, SUBMISSION_FAILED,
     # PENDING_PROCESSING, COMPLETED, PROCESSING_FAILED
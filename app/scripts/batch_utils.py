@@ -1,27 +1,109 @@
 import logging
-import json
+import os
+import re
 import uuid
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Tuple, Optional, Union, Iterable
+
+import orjson
 from sqlalchemy.orm import Session
 
-from app.scripts.llm_core.models import GenericLLMResponse
+from app.scripts.llm_core.models import BatchStatus, GenericLLMResponse
 from app.scripts.llm_client import get_llm_strategy, LLMClient
 from app.scripts.constants import GENERATED_UCS_RAW, UC_EVALUATIONS_RAW
 
 from app.crud.generated_ucs_raw import add_generated_ucs_raw
 from app.crud.knowledge_unit_evaluations_batch import add_knowledge_unit_evaluations_batch
 
+# Cerca markdown opcional (```json ... ```) em volta do JSON retornado pela LLM
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+# Registros por INSERT ao salvar resultados: limita a memória do processamento e fica
+# abaixo do limite de 65535 parâmetros por statement do PostgreSQL
+DB_FLUSH_BATCH_SIZE = 5000
+
+# Bytes aleatórios por uc_id (128 bits de um uuid4)
+UC_ID_BYTES = 16
+
+# Um job interno pode ter vários batches do provedor (shards); os ids ficam juntos em llm_batch_id
+BATCH_ID_SEPARATOR = ","
+LLM_FAILURE_STATUSES = ("failed", "cancelled", "expired")
 
-def check_batch_status(batch_id: str) -> Tuple[str, Optional[str], Optional[str]]:
+
+def check_batch_status(batch_id: str) -> BatchStatus:
     """
     Queries the status of an LLM batch job.
-    Returns a tuple: (status, output_file_id, error_file_id).
+    Returns a BatchStatus (status, output_file_id, error_file_id).
     """
     llm: LLMClient = get_llm_strategy() # Agora llm é do tipo LLMClient
     return llm.get_batch_status(batch_id)
 
 
+def check_batch_statuses(batch_ids: Iterable[str]) -> Dict[str, BatchStatus]:
+    """
+    Queries the status of several LLM batch jobs at once.
+    Returns a dict: {batch_id: BatchStatus}.
+    """
+    llm: LLMClient = get_llm_strategy()
+    return llm.get_batch_statuses(batch_ids)
+
+
+def split_batch_ids(llm_batch_id: str) -> List[str]:
+    """Separa o llm_batch_id armazenado nos batch ids individuais do provedor."""
+    return [batch_id.strip() for batch_id in llm_batch_id.split(BATCH_ID_SEPARATOR) if batch_id.strip()]
+
+
+def join_batch_ids(batch_ids: Iterable[str]) -> str:
+    """Junta batch ids do provedor no formato armazenado em llm_batch_id."""
+    return BATCH_ID_SEPARATOR.join(batch_ids)
+
+
+def submit_batch_file(llm: LLMClient, batch_input_file_path: Path, endpoint: str, description: str) -> str:
+    """
+    Uploads a formatted batch file via upload_merged (split at the provider's per-file limits)
+    and creates one provider batch per uploaded part.
+    Returns the llm_batch_id to store (the ids joined if the file needed more than one part).
+    """
+    file_ids = llm.upload_merged([batch_input_file_path])
+    batch_ids = [
+        llm.create_batch_job(
+            input_file_id=file_id,
+            endpoint=endpoint,
+            metadata={'description': description if len(file_ids) == 1 else f"{description} (part {i}/{len(file_ids)})"}
+        )
+        for i, file_id in enumerate(file_ids, 1)
+    ]
+    return join_batch_ids(batch_ids)
+
+
+def check_batch_group_status(llm_batch_id: str) -> BatchStatus:
+    """
+    Queries the combined status of the provider batch(es) stored in llm_batch_id.
+    A single id behaves like check_batch_status. For shards, a failed shard fails the
+    group (its status and file ids are returned); the group is 'completed' only when
+    every shard is, otherwise it reports the first non-completed shard status.
+    """
+    batch_ids = split_batch_ids(llm_batch_id)
+    if len(batch_ids) == 1:
+        return check_batch_status(batch_ids[0])
+
+    statuses = check_batch_statuses(batch_ids)
+    for batch_id in batch_ids:
+        if statuses[batch_id].status in LLM_FAILURE_STATUSES:
+            logging.warning(f"Shard {batch_id} of {llm_batch_id} ended with status {statuses[batch_id].status}.")
+            return statuses[batch_id]
+    for batch_id in batch_ids:
+        if statuses[batch_id].status != "completed":
+            return BatchStatus(statuses[batch_id].status, None, None)
+    return BatchStatus(
+        "completed",
+        join_batch_ids(s.output_file_id for s in statuses.values() if s.output_file_id),
+        join_batch_ids(s.error_file_id for s in statuses.values() if s.error_file_id) or None,
+    )
+
+
 class BaseBatchProcessor(ABC):
     def __init__(
             self,
@@ -43,53 +125,80 @@ class BaseBatchProcessor(ABC):
     def process(self, db: Session) -> bool:
         logging.info(
             f"Processing results for Batch ID: {self.batch_id}, Run ID: {self.run_id}, Output File: {self.output_file_id}, Type: {self.output_filename_key}")
+
+        try:
+            # Streams the result file to the stage dir instead of holding it in memory; also kept for debugging.
+            result_file_path = Path(self.stage_output_dir) / f"{self.output_file_id}.jsonl"
+            logging.debug(f"Attempting to download file: {self.output_file_id} from LLM provider to {result_file_path}.")
+            # The error file (if any) is an independent download: fetch it while the output file streams.
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                error_file_future = executor.submit(self._log_error_file_content) if self.error_file_id else None
+                self.llm.download_file(self.output_file_id, result_file_path)
+                if error_file_future is not None:
+                    error_file_future.result()
+            logging.info(f"Successfully downloaded result file {self.output_file_id} for batch {self.batch_id} to {result_file_path}.")
+        except Exception:
+            logging.exception(
+                f"Critical error during file download for batch {self.batch_id}, output file {self.output_file_id}.")
+            return False
+
+        return self.process_result_file(db, result_file_path)
+
+    def process_result_file(self, db: Session, result_file_path: Path) -> bool:
+        """
+        Parses a local result file in the provider's batch output format and saves the items to the DB.
+        Used after downloading a batch output file and by the real-time path, which writes the same format.
+        """
         processed_data_for_db: List[Dict[str, Any]] = []
+        total_items_saved = 0
         total_line_errors = 0
         lines_resulting_in_data = 0
         overall_success = True
 
         try:
-            if self.error_file_id:
-                self._log_error_file_content()
-
-            logging.debug(f"Attempting to read file: {self.output_file_id} from LLM provider.")
-            content_bytes = self.llm.read_file(self.output_file_id)
-            result_content_str = content_bytes.decode('utf-8')
-            logging.info(f"Successfully downloaded result file {self.output_file_id} for batch {self.batch_id}.")
-
-            lines = result_content_str.strip().split('\n')
-            if not lines or (len(lines) == 1 and not lines[0].strip()):
+            non_blank_lines = 0
+            # Iterates raw byte lines lazily: no decoded copy of the whole file; orjson parses bytes directly.
+            with open(result_file_path, 'rb', buffering=1 << 20) as result_file:
+                for line_number, line_content in enumerate(result_file, 1):
+                    if line_content.isspace():
+                        logging.debug(f"Skipping blank line {line_number} in batch {self.batch_id}.")
+                        continue
+                    non_blank_lines += 1
+
+                    items_from_line, errors_in_line = self._process_single_line_wrapper(line_content, line_number)
+                    if items_from_line:
+                        processed_data_for_db.extend(items_from_line)
+                        lines_resulting_in_data += 1
+                    if errors_in_line > 0:
+                        total_line_errors += errors_in_line
+
+                    if len(processed_data_for_db) >= DB_FLUSH_BATCH_SIZE:
+                        self._save_to_db(db, processed_data_for_db)
+                        total_items_saved += len(processed_data_for_db)
+                        processed_data_for_db = []
+
+            if non_blank_lines == 0:
                 logging.warning(f"Result file for batch {self.batch_id} is empty or contains only whitespace.")
                 return True
 
-            for line_number, line_content_str in enumerate(lines, 1):
-                if not line_content_str.strip():
-                    logging.debug(f"Skipping blank line {line_number} in batch {self.batch_id}.")
-                    continue
-
-                items_from_line, errors_in_line = self._process_single_line_wrapper(line_content_str, line_number)
-                if items_from_line:
-                    processed_data_for_db.extend(items_from_line)
-                    lines_resulting_in_data += 1
-                if errors_in_line > 0:
-                    total_line_errors += errors_in_line
+            if processed_data_for_db:
+                self._save_to_db(db, processed_data_for_db)
+                total_items_saved += len(processed_data_for_db)
 
             logging.info(
                 f"Batch file processing complete for batch {self.batch_id} (Type: {self.output_filename_key}). "
-                f"Extracted {len(processed_data_for_db)} items for DB from {lines_resulting_in_data} lines. "
+                f"Saved {total_items_saved} items to DB from {lines_resulting_in_data} lines. "
                 f"Encountered {total_line_errors} errors in individual lines."
             )
 
-            if processed_data_for_db:
-                self._save_to_db(db, processed_data_for_db)
-            elif total_line_errors > 0 and lines_resulting_in_data == 0:
+            if total_line_errors > 0 and lines_resulting_in_data == 0:
                 logging.error(
                     f"No data successfully processed from batch {self.batch_id} (Type: {self.output_filename_key}) due to errors in all relevant lines.")
                 overall_success = False
 
         except Exception:
             logging.exception(
-                f"Critical error during file download or main processing for batch {self.batch_id}, output file {self.output_file_id}.")
+                f"Critical error during main processing for batch {self.batch_id}, result file {result_file_path}.")
             overall_success = False
         return overall_success
 
@@ -106,22 +215,22 @@ class BaseBatchProcessor(ABC):
         except Exception:
             logging.exception(f"Failed to read or decode error file {self.error_file_id} for batch {self.batch_id}.")
 
-    def _process_single_line_wrapper(self, line_content_str: str, line_number: int) -> Tuple[List[Dict[str, Any]], int]:
+    def _process_single_line_wrapper(self, line_content: Union[str, bytes], line_number: int) -> Tuple[List[Dict[str, Any]], int]:
         try:
-            return self._process_line_content(line_content_str, line_number)
+            return self._process_line_content(line_content, line_number)
         except Exception:
             logging.exception(
                 f"Fatal error processing line {line_number} of batch {self.batch_id} (run_id: {self.run_id}, type: {self.output_filename_key}). "
-                f"Line (first 200 chars): '{line_content_str[:200]}'"
+                f"Line (first 200 chars): '{line_content[:200]}'"
             )
             return [], 1
 
-    def _process_line_content(self, line_content_str: str, line_number: int) -> Tuple[List[Dict[str, Any]], int]:
+    def _process_line_content(self, line_content: Union[str, bytes], line_number: int) -> Tuple[List[Dict[str, Any]], int]:
         """
         Usa o parser do LLMClient para obter uma GenericLLMResponse,
         e então delega para _parse_llm_response_content_wrapper com o conteúdo genérico.
         """
-        generic_response: GenericLLMResponse = self.llm.parse_llm_batch_line(line_content_str)
+        generic_response: GenericLLMResponse = self.llm.parse_llm_batch_line(line_content)
 
         request_metadata = generic_response['request_metadata']
         original_provider_custom_id = generic_response.get('raw_response_data', {}).get('custom_id', 'unknown_provider_custom_id')
@@ -185,16 +294,11 @@ class BaseBatchProcessor(ABC):
 
         parsed_items: List[Dict[str, Any]] = []
         parsing_errors = 0
-        content_cleaned = llm_message_content_str.strip()
-
-        if content_cleaned.startswith("```json"):
-            content_cleaned = content_cleaned[len("```json"):-len("```")].strip()
-        elif content_cleaned.startswith("```"):
-            content_cleaned = content_cleaned[len("```"):-len("```")].strip()
+        content_cleaned = _FENCE_RE.sub("", llm_message_content_str.strip())
 
         try:
-            inner_data = json.loads(content_cleaned)
-        except json.JSONDecodeError:
+            inner_data = orjson.loads(content_cleaned)
+        except orjson.JSONDecodeError:
             logging.error(
                 f"Falha ao decode JSON interno da LLM response (metadata: {request_metadata_from_line}, run: {self.run_id}, line: {line_number}). "
                 f"Cleaned content (first 200 chars): '{content_cleaned[:200]}'"
@@ -243,7 +347,6 @@ class GenerationBatchProcessor(BaseBatchProcessor):
         for unit_idx, unit_data in enumerate(generated_units):
             if isinstance(unit_data, dict) and "bloom_level" in unit_data and "uc_text" in unit_data:
                 record = {
-                    "uc_id": str(uuid.uuid4()),
                     "origin_id": origin_id_for_uc,
                     "bloom_level": unit_data["bloom_level"],
                     "uc_text": unit_data["uc_text"],
@@ -260,6 +363,10 @@ class GenerationBatchProcessor(BaseBatchProcessor):
 
     def _save_to_db(self, db: Session, processed_data: List[Dict[str, Any]]) -> None:
         logging.debug(f"Saving {len(processed_data)} generated UCs for run_id {self.run_id} (Type: {self.output_filename_key}).")
+        # uc_ids do bloco inteiro numa só leitura do CSPRNG, no formato uuid4 canônico (com hífens)
+        random_bytes = os.urandom(UC_ID_BYTES * len(processed_data))
+        for i, record in enumerate(processed_data):
+            record["uc_id"] = str(uuid.UUID(bytes=random_bytes[i * UC_ID_BYTES:(i + 1) * UC_ID_BYTES], version=4))
         add_generated_ucs_raw(db, self.run_id, processed_data)
 
 
@@ -312,6 +419,25 @@ class DifficultyBatchProcessor(BaseBatchProcessor):
         logging.debug(f"Saving {len(processed_data)} difficulty assessments for run_id {self.run_id} (Type: {self.output_filename_key}).")
         add_knowledge_unit_evaluations_batch(db, self.run_id, processed_data)
 
+def _build_processor(
+        batch_id: str,
+        output_file_id: Optional[str],
+        error_file_id: Optional[str],
+        stage_output_dir: Any,
+        output_filename_key: str,
+        run_id: str
+) -> Optional[BaseBatchProcessor]:
+    if output_filename_key == GENERATED_UCS_RAW:
+        return GenerationBatchProcessor(
+            batch_id, output_file_id, error_file_id, stage_output_dir, output_filename_key, run_id
+        )
+    if output_filename_key == UC_EVALUATIONS_RAW:
+        return DifficultyBatchProcessor(
+            batch_id, output_file_id, error_file_id, stage_output_dir, output_filename_key, run_id
+        )
+    logging.error(f"Unsupported 'output_filename_key': {output_filename_key} for batch processing (run_id: {run_id}).")
+    return None
+
 def process_batch_results(
         batch_id: str,
         output_file_id: str,
@@ -324,18 +450,23 @@ def process_batch_results(
     logging.debug(
         f"process_batch_results called for: batch_id='{batch_id}', output_filename_key='{output_filename_key}', run_id='{run_id}'"
     )
-    processor: Optional[BaseBatchProcessor] = None
-
-    if output_filename_key == GENERATED_UCS_RAW:
-        processor = GenerationBatchProcessor(
-            batch_id, output_file_id, error_file_id, stage_output_dir, output_filename_key, run_id
-        )
-    elif output_filename_key == UC_EVALUATIONS_RAW:
-        processor = DifficultyBatchProcessor(
-            batch_id, output_file_id, error_file_id, stage_output_dir, output_filename_key, run_id
-        )
-    else:
-        logging.error(f"Unsupported 'output_filename_key': {output_filename_key} for batch processing (run_id: {run_id}).")
+    processor = _build_processor(batch_id, output_file_id, error_file_id, stage_output_dir, output_filename_key, run_id)
+    if processor is None:
         return False
+    return processor.process(db)
 
-    return processor.process(db)
\ No newline at end of file
+def process_local_results(
+        batch_id: str,
+        result_file_path: Path,
+        output_filename_key: str,
+        run_id: str,
+        db: Session
+) -> bool:
+    """Processes a result file already on disk (batch output format), e.g. written by the real-time path."""
+    logging.debug(
+        f"process_local_results called for: batch_id='{batch_id}', file='{result_file_path}', output_filename_key='{output_filename_key}', run_id='{run_id}'"
+    )
+    processor = _build_processor(batch_id, None, None, result_file_path.parent, output_filename_key, run_id)
+    if processor is None:
+        return False
+    return processor.process_result_file(db, result_file_path)
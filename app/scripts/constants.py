@@ -29,6 +29,11 @@ LLM_TEMPERATURE_GENERATION = float(os.environ.get('LLM_TEMPERATURE_GENERATION',
 LLM_TEMPERATURE_DIFFICULTY = float(os.environ.get('LLM_TEMPERATURE_DIFFICULTY', 0.1))
 DIFFICULTY_BATCH_SIZE = int(os.environ.get('DIFFICULTY_BATCH_SIZE', 5))
 MIN_EVALUATIONS_PER_UC = int(os.environ.get('MIN_EVALUATIONS_PER_UC', 3))
+# Requests por batch de geração de UC: acima disso as origens são divididas em vários batches
+# submetidos em paralelo (cada um anda na fila da OpenAI de forma independente). 0 desativa.
+UC_GENERATION_SHARD_SIZE = int(os.environ.get('UC_GENERATION_SHARD_SIZE', 5000))
+# Chamadas simultâneas no caminho de geração em tempo real (sem Batch API)
+OPENAI_MAX_CONCURRENCY = int(os.environ.get('OPENAI_MAX_CONCURRENCY', 8))
 # BATCH API não usa concorrência configurável do nosso lado
 # UC_GENERATION_BATCH_SIZE = 20 # Não relevante para Batch API (tamanho do arquivo é o limite)
 
@@ -2,7 +2,22 @@ import pandas as pd
 from pathlib import Path
 import json
 import logging
-from typing import Optional, List, Dict, Any
+import mmap
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Optional, List, Dict, Any, Sequence, Iterator
+
+# Chaves não-str (int, float, bool, None) viram str e tipos numpy são serializados, como o json aceitava
+_JSONL_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _jsonl_line(rec: Dict[str, Any]) -> bytes:
+    try:
+        return orjson.dumps(rec, option=_JSONL_ORJSON_OPTIONS) + b'\n'
+    except TypeError:
+        # O que o orjson ainda recusa (ex.: int acima de 64 bits) segue pelo json, como antes
+        return (json.dumps(rec, ensure_ascii=False) + '\n').encode('utf-8')
 
 class DataLake:
     """Fachada para operações de I/O: Parquet, JSON, JSONL."""
@@ -11,26 +26,76 @@ class DataLake:
         try:
             stage_dir.mkdir(parents=True, exist_ok=True)
             output_path = stage_dir / f"{filename}.parquet"
-            df.to_parquet(output_path, index=False)
+            # zstd + dictionary encoding: arquivos menores e releitura mais rápida (ids repetem muito).
+            # Row groups de 50k linhas com estatísticas: iter_parquet lê em blocos menores e filtros
+            # futuros (ex.: por bloom_level) podem pular row groups inteiros pelo min/max.
+            pq.write_table(
+                pa.Table.from_pandas(df, preserve_index=False),
+                output_path,
+                compression="zstd",
+                compression_level=3,
+                use_dictionary=True,
+                data_page_size=1 << 20,
+                row_group_size=50_000,
+                write_statistics=True,
+            )
             logging.info(f"Salvo {len(df)} linhas em {output_path}")
         except Exception:
             logging.exception(f"Falha ao salvar Parquet em {stage_dir}/{filename}.parquet")
             raise
 
     @staticmethod
-    def load_parquet(stage_dir: Path, filename: str) -> Optional[pd.DataFrame]:
+    def load_parquet(
+            stage_dir: Path,
+            filename: str,
+            columns: Optional[Sequence[str]] = None
+    ) -> Optional[pd.DataFrame]:
         file_path = stage_dir / f"{filename}.parquet"
         if not file_path.is_file():
             logging.error(f"Arquivo de input não encontrado: {file_path}")
             return None
         try:
-            df = pd.read_parquet(file_path)
+            # columns: projeção no leitor, colunas não pedidas nem são decodificadas
+            table = pq.read_table(
+                file_path,
+                columns=list(columns) if columns is not None else None,
+                pre_buffer=True,
+                use_threads=True,
+            )
+            df = table.to_pandas()
             logging.info(f"Carregado {len(df)} linhas de {file_path}")
             return df
         except Exception:
             logging.exception(f"Falha ao carregar Parquet de {file_path}")
             return None
 
+    @staticmethod
+    def iter_parquet(
+            stage_dir: Path,
+            filename: str,
+            columns: Optional[Sequence[str]] = None,
+            batch_size: int = 65536
+    ) -> Iterator[pd.DataFrame]:
+        """Lê o Parquet em blocos de até batch_size linhas; o pico de memória fica limitado ao bloco."""
+        file_path = stage_dir / f"{filename}.parquet"
+        if not file_path.is_file():
+            logging.error(f"Arquivo de input não encontrado: {file_path}")
+            return
+        try:
+            total_rows = 0
+            with pq.ParquetFile(file_path, memory_map=True, pre_buffer=True) as parquet_file:
+                for record_batch in parquet_file.iter_batches(
+                        batch_size=batch_size,
+                        columns=list(columns) if columns is not None else None,
+                        use_threads=True,
+                ):
+                    total_rows += record_batch.num_rows
+                    yield record_batch.to_pandas()
+            logging.info(f"Lido {total_rows} linhas em blocos de {file_path}")
+        except Exception:
+            logging.exception(f"Falha ao ler Parquet em blocos de {file_path}")
+            raise
+
     @staticmethod
     def write_json(data: Any, file_path: Path, indent: int = 2) -> None:
         try:
@@ -48,8 +113,10 @@ class DataLake:
             logging.error(f"JSON input não encontrado: {file_path}")
             return None
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # mmap: o kernel pagina o arquivo sob demanda e o orjson lê direto do buffer, sem cópia str intermediária
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                    memoryview(mm) as view:
+                data = orjson.loads(view)
             logging.info(f"Carregado JSON de {file_path}")
             return data
         except Exception:
@@ -60,9 +127,8 @@ class DataLake:
     def write_jsonl(records: List[Dict[str, Any]], file_path: Path) -> None:
         try:
             file_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                for rec in records:
-                    f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+            with open(file_path, 'wb', buffering=1 << 20) as f:
+                f.writelines(_jsonl_line(rec) for rec in records)
             logging.info(f"Salvo JSONL ({len(records)} linhas) em {file_path}")
         except Exception:
             logging.exception(f"Falha ao salvar JSONL em {file_path}")
@@ -75,11 +141,14 @@ class DataLake:
             logging.error(f"JSONL input não encontrado: {file_path}")
             return records
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
+            if file_path.stat().st_size == 0:  # mmap não aceita arquivos vazios
+                logging.info(f"Carregado JSONL (0 linhas) de {file_path}")
+                return records
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b''):
                     try:
-                        records.append(json.loads(line))
-                    except json.JSONDecodeError:
+                        records.append(orjson.loads(line))
+                    except orjson.JSONDecodeError:
                         logging.warning(f"Falha parsing JSONL linha: {line[:100]}...")
             logging.info(f"Carregado JSONL ({len(records)} linhas) de {file_path}")
         except Exception:
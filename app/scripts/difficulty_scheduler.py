@@ -1,7 +1,7 @@
 # scripts/difficulty_scheduler.py
 import logging
 from collections import defaultdict, Counter
-import random
+import heapq
 from typing import List, Dict, Set, Tuple, Optional, Any
 
 DEFAULT_MAX_ASCENT_LEVELS = 1
@@ -166,15 +166,13 @@ class OriginDifficultyScheduler:
         if not candidate_neighbors or num_needed <= 0:
             return []
 
-        shuffled_candidates = list(candidate_neighbors)
-        random.shuffle(shuffled_candidates)
-
-        sorted_candidates = sorted(
-            shuffled_candidates,
+        # A chave (contagem, oid) é única por candidato, então a ordem de entrada não altera o resultado
+        # (um shuffle prévio não tinha efeito); nsmallest evita ordenar a lista inteira.
+        selected = heapq.nsmallest(
+            num_needed,
+            candidate_neighbors,
             key=lambda oid: (self.evaluation_counts[oid], oid)
         )
-
-        selected = sorted_candidates[:num_needed]
         logging.info(
             f"[SELECT_FINAL] Seed {seed_origin_id}: Selected {len(selected)} final neighbors: {selected} (Counts: {{oid: self.evaluation_counts[oid] for oid in selected}})")
         return selected
@@ -1,6 +1,8 @@
 import logging
 from typing import List, Dict, Any, Tuple
-from collections import defaultdict, Counter
+
+import pandas as pd
+
 from app.scripts.constants import MIN_EVALUATIONS_PER_UC
 
 def _format_difficulty_prompt(
@@ -8,11 +10,10 @@ def _format_difficulty_prompt(
     prompt_template: str
 ) -> str:
     """Formata o prompt de avaliação de dificuldade para um batch."""
-    prompt_input_text = ""
-    for uc_data in batch_ucs_data:
-        uc_id = uc_data.get('uc_id', 'N/A')
-        uc_text = uc_data.get('uc_text', 'N/A')
-        prompt_input_text += f"- ID: {uc_id}\n  Texto: {uc_text}\n"
+    prompt_input_text = "".join(
+        f"- ID: {uc_data.get('uc_id', 'N/A')}\n  Texto: {uc_data.get('uc_text', 'N/A')}\n"
+        for uc_data in batch_ucs_data
+    )
     return prompt_template.replace("{{BATCH_OF_UCS}}", prompt_input_text.strip())
 
 def _calculate_final_difficulty_from_raw(
@@ -21,43 +22,54 @@ def _calculate_final_difficulty_from_raw(
 ) -> Tuple[List[Dict[str, Any]], int, int]:
     """Calcula o score final a partir das avaliações brutas do batch."""
     logging.info("Calculando scores finais de dificuldade a partir dos resultados do batch...")
-    uc_scores: Dict[str, List[int]] = defaultdict(list)
-    uc_justifications: Dict[str, List[str]] = defaultdict(list)
-    uc_evaluation_count: Counter = Counter()
-
-    for evaluation in raw_evaluations:
-        uc_id = evaluation.get("knowledge_unit_id")
-        score = evaluation.get("difficulty_score")
-        justification = evaluation.get("justification")
-        if uc_id and isinstance(score, int) and 0 <= score <= 100:
-            uc_scores[uc_id].append(score)
-        if justification:
-            uc_justifications[uc_id].append(justification)
-            uc_evaluation_count[uc_id] += 1
-    updated_ucs_list: List[Dict[str, Any]] = []
-    evaluated_count = 0
-    min_evals_met_count = 0
-
-    for original_uc in generated_ucs:
-        uc = original_uc.copy()
-        uc_id = uc.get("uc_id")
-        scores = uc_scores.get(uc_id)
-        eval_count = uc_evaluation_count.get(uc_id, 0)
-
-        if scores:
-            final_score = round(sum(scores) / len(scores))
-            justification_text = " | ".join(uc_justifications.get(uc_id, ["N/A"]))
-            uc["difficulty_score"] = final_score
-            uc["difficulty_justification"] = justification_text
-            uc["evaluation_count"] = eval_count
-            evaluated_count += 1
-        if eval_count >= MIN_EVALUATIONS_PER_UC:
-            min_evals_met_count += 1
-        else:
-            uc["difficulty_score"] = None
-            uc["difficulty_justification"] = "Não avaliado"
-            uc["evaluation_count"] = 0
-        updated_ucs_list.append(uc)
+    evals_df = pd.DataFrame.from_records(
+        raw_evaluations, columns=["knowledge_unit_id", "difficulty_score", "justification"]
+    )
+    uc_ids = evals_df["knowledge_unit_id"]
+    # Só valores int são scores (como isinstance(score, int)): 50.0 e "50" continuam rejeitados.
+    # O teste é feito nos registros brutos: no DataFrame a coluna vira int64/float64 (None -> NaN)
+    is_int_score = pd.Series(
+        [isinstance(evaluation.get("difficulty_score"), int) for evaluation in raw_evaluations],
+        index=evals_df.index, dtype=bool,
+    )
+    scores = pd.to_numeric(evals_df["difficulty_score"].where(is_int_score), errors="coerce")
+    justifications = evals_df["justification"]
+
+    # Score válido: inteiro entre 0 e 100 com uc_id preenchido
+    valid_score = uc_ids.notna() & (uc_ids != "") & is_int_score & scores.between(0, 100)
+    # A contagem de avaliações segue as justificativas, independente do score
+    has_justification = justifications.notna() & (justifications != "")
+
+    mean_scores = scores[valid_score].groupby(uc_ids[valid_score], sort=False).mean().round()
+    justifications_by_uc = justifications[has_justification].groupby(uc_ids[has_justification], sort=False)
+    evaluation_counts = justifications_by_uc.size()
+
+    # dtype=object: preserva None/str das UCs; as três colunas de dificuldade sempre existem no resultado
+    ucs_df = pd.DataFrame(generated_ucs, dtype=object)
+    if ucs_df.empty:
+        return [], 0, 0
+    for column in ("difficulty_score", "difficulty_justification", "evaluation_count"):
+        if column not in ucs_df.columns:
+            ucs_df[column] = None
+    ucs_ids = ucs_df["uc_id"] if "uc_id" in ucs_df.columns else pd.Series(None, index=ucs_df.index, dtype=object)
+
+    final_scores = ucs_ids.map(mean_scores)
+    eval_counts = ucs_ids.map(evaluation_counts).fillna(0).astype(int)
+    has_score = final_scores.notna()
+    min_evals_met = eval_counts >= MIN_EVALUATIONS_PER_UC
+
+    ucs_df.loc[has_score, "difficulty_score"] = final_scores[has_score].astype(int)
+    ucs_df.loc[has_score, "difficulty_justification"] = (
+        ucs_ids[has_score].map(justifications_by_uc.agg(" | ".join)).fillna("N/A")
+    )
+    ucs_df.loc[has_score, "evaluation_count"] = eval_counts[has_score]
+    ucs_df.loc[~min_evals_met, "difficulty_score"] = None
+    ucs_df.loc[~min_evals_met, "difficulty_justification"] = "Não avaliado"
+    ucs_df.loc[~min_evals_met, "evaluation_count"] = 0
+
+    updated_ucs_list: List[Dict[str, Any]] = ucs_df.to_dict("records")
+    evaluated_count = int(has_score.sum())
+    min_evals_met_count = int(min_evals_met.sum())
     logging.info(f"  {evaluated_count}/{len(generated_ucs)} UCs receberam score.")
     logging.info(f"  {min_evals_met_count}/{len(generated_ucs)} UCs atingiram {MIN_EVALUATIONS_PER_UC} avaliações.")
-    return updated_ucs_list, evaluated_count, min_evals_met_count
\ No newline at end of file
+    return updated_ucs_list, evaluated_count, min_evals_met_count
@@ -1,12 +1,31 @@
+import functools
 import pandas as pd
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Sequence, Iterator
 from app.scripts.data_lake import DataLake
 
+@functools.lru_cache(maxsize=None)
+def load_prompt(path: Path) -> str:
+    """Lê um template de prompt; o conteúdo fica em cache no processo (reexecuções e retries não releem o arquivo)."""
+    return Path(path).read_text(encoding='utf-8')
+
 def save_dataframe(df: pd.DataFrame, stage_dir: Path, filename: str):
     """Salva um DataFrame em formato Parquet no diretório do estágio via DataLake."""
     DataLake.save_parquet(df, stage_dir, filename)
 
-def load_dataframe(stage_dir: Path, filename: str) -> Optional[pd.DataFrame]:
-    """Carrega um DataFrame Parquet de um diretório de estágio via DataLake."""
-    return DataLake.load_parquet(stage_dir, filename)
\ No newline at end of file
+def load_dataframe(
+        stage_dir: Path,
+        filename: str,
+        columns: Optional[Sequence[str]] = None
+) -> Optional[pd.DataFrame]:
+    """Carrega um DataFrame Parquet de um diretório de estágio via DataLake (opcionalmente só `columns`)."""
+    return DataLake.load_parquet(stage_dir, filename, columns=columns)
+
+def iter_dataframe(
+        stage_dir: Path,
+        filename: str,
+        columns: Optional[Sequence[str]] = None,
+        batch_size: int = 65536
+) -> Iterator[pd.DataFrame]:
+    """Itera um Parquet de um diretório de estágio em DataFrames de até batch_size linhas via DataLake."""
+    return DataLake.iter_parquet(stage_dir, filename, columns=columns, batch_size=batch_size)
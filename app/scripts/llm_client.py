@@ -1,15 +1,30 @@
+import functools
+import hashlib
+import itertools
 import logging
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Tuple, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Tuple, Optional, List, Union, Iterator, Dict, Iterable, Callable
 from pathlib import Path
 
 try:
-    from openai import OpenAI
+    import httpx
+    from openai import OpenAI, RateLimitError, APIConnectionError, APIStatusError
 except ImportError:
+    httpx = None
     OpenAI = None
+    RateLimitError = APIConnectionError = APIStatusError = None
 
 from app.scripts.llm_core.models import (
-    GenericLLMRequest, GenericLLMResponse,
+    BatchStatus, GenericLLMRequest, GenericLLMResponse,
     IBatchRequestFormatter, IBatchResponseParser
 )
 from app.scripts.llm_providers.openai_utils import (
@@ -17,39 +32,228 @@ from app.scripts.llm_providers.openai_utils import (
 )
 
 
+logger = logging.getLogger(__name__)
+
 OPENAI_CLIENT_INSTANCE: Optional[OpenAI] = None 
 
+# Buffer de leitura do upload: menos syscalls e chunks HTTP maiores para arquivos de batch grandes
+UPLOAD_READ_BUFFER_SIZE = 4 * 1024 * 1024
+# Tamanho dos chunks ao baixar arquivos do provedor
+FILE_CHUNK_SIZE = 1024 * 1024
+# Máximo de uploads + criações de batch simultâneos em submit_batches
+BATCH_SUBMIT_CONCURRENCY = int(os.getenv("LLM_BATCH_SUBMIT_CONCURRENCY", "4"))
+# Cache em disco de uploads/downloads do provedor (desativado se LLM_CACHE_DIR não estiver definido)
+LLM_CACHE_DIR: Optional[str] = os.getenv("LLM_CACHE_DIR")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Acima deste tamanho o upload usa a Uploads API em partes paralelas, com retry por parte
+MULTIPART_UPLOAD_THRESHOLD = 32 * 1024 * 1024
+MULTIPART_PART_SIZE = 16 * 1024 * 1024
+MULTIPART_MAX_WORKERS = 4
+MULTIPART_PART_ATTEMPTS = 3
+# Limites por arquivo de batch (OpenAI: 50k requests / 100 MB), com folga
+BATCH_FILE_MAX_BYTES = 90 * 1024 * 1024
+BATCH_FILE_MAX_LINES = 45_000
+# Tamanho de página da listagem de batches (máximo da API)
+BATCH_LIST_PAGE_SIZE = 100
+# Retry curto das consultas de status em erros transitórios: 3 tentativas de até 5s, esperas de até 2s
+# (pior caso ~19s, abaixo do request_timeout de 30s do BatchJobStatusTrigger)
+STATUS_MAX_ATTEMPTS = 3
+STATUS_REQUEST_TIMEOUT_SECONDS = 5.0
+STATUS_RETRY_MAX_DELAY_SECONDS = 2.0
+# Circuit breaker das consultas de status após falhas transitórias seguidas
+STATUS_BREAKER_FAIL_MAX = 10
+STATUS_BREAKER_RESET_SECONDS = 60.0
+# Limite de criações de batch por segundo (token bucket) e retries em 429
+LLM_BATCH_CREATE_RPS = float(os.getenv("LLM_BATCH_CREATE_RPS", "5"))
+LLM_RATE_LIMIT_MAX_RETRIES = 5
+
+def _is_transient_api_error(e: Exception) -> bool:
+    """Erros de conexão/timeout, 429 e 5xx: vale tentar de novo. Demais (auth, 4xx) são definitivos."""
+    if OpenAI is None:
+        return False
+    if isinstance(e, (APIConnectionError, RateLimitError)):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code >= 500
+
+
+class _CircuitBreaker:
+    """
+    Abre após fail_max falhas seguidas; enquanto aberto as chamadas falham na hora, até reset_timeout.
+    Depois disso fica meio-aberto: uma única chamada de teste passa; sucesso fecha, falha reabre.
+    """
+
+    def __init__(self, fail_max: int, reset_timeout: float):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Meio-aberto: só quem chegar primeiro faz a chamada de teste
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+
+
 class LLMClient(ABC):
-    @abstractmethod
     def prepare_and_upload_batch_file(
         self,
         generic_requests: List[GenericLLMRequest],
         batch_input_file_path: Path,
-        batch_endpoint_url: str
+        batch_endpoint_url: str = "/v1/chat/completions"
     ) -> str:
         """
         Formata as requisições genéricas para o formato de batch do provedor,
         salva o arquivo, faz o upload e retorna o file_id do provedor.
         """
+        self.format_batch_file(generic_requests, batch_input_file_path, batch_endpoint_url)
+        return self.upload_batch_file(batch_input_file_path)
+
+    @abstractmethod
+    def format_batch_file(
+        self,
+        generic_requests: List[GenericLLMRequest],
+        batch_input_file_path: Path,
+        batch_endpoint_url: str
+    ) -> None:
+        """Formata as requisições genéricas no formato de batch do provedor e salva em batch_input_file_path."""
         pass
 
+    @abstractmethod
+    def upload_batch_file(self, batch_input_file_path: Path) -> str:
+        """Faz upload de um arquivo de batch já formatado e retorna o file_id do provedor."""
+        pass
+
+    def upload_merged(
+        self,
+        shard_paths: List[Path],
+        max_bytes: int = BATCH_FILE_MAX_BYTES,
+        max_lines: int = BATCH_FILE_MAX_LINES
+    ) -> List[str]:
+        """
+        Junta vários arquivos JSONL de batch em o mínimo de arquivos possível (respeitando max_bytes
+        e max_lines por arquivo) e faz um upload por arquivo resultante. Retorna os file_ids na ordem.
+        Um único arquivo que já cabe nos limites é enviado direto, sem cópia.
+        """
+        if len(shard_paths) == 1 and shard_paths[0].stat().st_size <= max_bytes:
+            with open(shard_paths[0], 'rb', buffering=UPLOAD_READ_BUFFER_SIZE) as shard:
+                fits = sum(1 for line in shard if not line.isspace()) <= max_lines
+            if fits:
+                return [self.upload_batch_file(shard_paths[0])]
+
+        file_ids: List[str] = []
+        part_dir = shard_paths[0].parent if shard_paths else None
+        part = None
+        part_bytes = part_lines = 0
+
+        def _flush() -> None:
+            nonlocal part, part_bytes, part_lines
+            if part is None:
+                return
+            part.close()
+            try:
+                file_ids.append(self.upload_batch_file(Path(part.name)))
+            finally:
+                os.unlink(part.name)
+            part, part_bytes, part_lines = None, 0, 0
+
+        try:
+            for shard_path in shard_paths:
+                with open(shard_path, 'rb', buffering=UPLOAD_READ_BUFFER_SIZE) as shard:
+                    for line in shard:
+                        if line.isspace():
+                            continue
+                        if not line.endswith(b'\n'):
+                            line += b'\n'
+                        if part is not None and (part_bytes + len(line) > max_bytes or part_lines >= max_lines):
+                            _flush()
+                        if part is None:
+                            part = tempfile.NamedTemporaryFile(
+                                'wb', dir=part_dir, prefix="merged_batch_", suffix=".jsonl",
+                                delete=False, buffering=UPLOAD_READ_BUFFER_SIZE
+                            )
+                        part.write(line)
+                        part_bytes += len(line)
+                        part_lines += 1
+            _flush()
+        finally:
+            if part is not None:
+                part.close()
+                os.unlink(part.name)
+        logger.info("%d arquivos de batch enviados como %d upload(s).", len(shard_paths), len(file_ids))
+        return file_ids
+
     @abstractmethod
     def create_batch_job(self, input_file_id: str, endpoint: str, metadata: dict) -> str:
         """Cria job de batch e retorna batch_id."""
         pass
 
+    def submit_batches(
+        self,
+        batch_input_file_paths: List[Path],
+        endpoint: str,
+        metadata_fn: Callable[[Path], dict],
+        max_concurrency: int = BATCH_SUBMIT_CONCURRENCY
+    ) -> List[str]:
+        """
+        Faz upload e cria um batch para cada arquivo, com até max_concurrency submissões
+        em paralelo. Retorna os batch_ids na mesma ordem dos arquivos.
+        """
+        def _upload_and_create(path: Path) -> str:
+            input_file_id = self.upload_batch_file(path)
+            return self.create_batch_job(input_file_id, endpoint, metadata_fn(path))
+
+        if len(batch_input_file_paths) <= 1:
+            return [_upload_and_create(path) for path in batch_input_file_paths]
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            return list(executor.map(_upload_and_create, batch_input_file_paths))
+
     @abstractmethod
-    def get_batch_status(self, batch_id: str) -> Tuple[str, Optional[str], Optional[str]]:
-        """Consulta status do batch: retorna (status, output_file_id, error_file_id)."""
+    def get_batch_status(self, batch_id: str) -> BatchStatus:
+        """Consulta status do batch: retorna BatchStatus(status, output_file_id, error_file_id)."""
         pass
 
+    def get_batch_statuses(self, batch_ids: Iterable[str]) -> Dict[str, BatchStatus]:
+        """Consulta o status de vários batches: retorna {batch_id: BatchStatus}."""
+        return {batch_id: self.get_batch_status(batch_id) for batch_id in set(batch_ids)}
+
     @abstractmethod
-    def read_file(self, file_id: str) -> bytes:
-        """Lê conteúdo bruto de um file_id do provedor."""
+    def iter_file(self, file_id: str, chunk_size: int = FILE_CHUNK_SIZE) -> Iterator[bytes]:
+        """Itera o conteúdo bruto de um file_id do provedor em chunks, conforme chegam da rede."""
         pass
 
+    def read_file(self, file_id: str) -> bytes:
+        """Lê conteúdo bruto de um file_id do provedor (arquivo inteiro em memória; use para arquivos pequenos)."""
+        return b"".join(self.iter_file(file_id))
+
+    def download_file(self, file_id: str, destination: Path) -> None:
+        """Baixa o conteúdo de um file_id do provedor direto para destination, sem carregá-lo inteiro em memória."""
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        with open(destination, 'wb') as f:
+            for chunk in self.iter_file(file_id):
+                f.write(chunk)
+
     @abstractmethod
-    def parse_llm_batch_line(self, line_content: str) -> GenericLLMResponse:
+    def parse_llm_batch_line(self, line_content: Union[str, bytes]) -> GenericLLMResponse:
         """
         Usa o parser específico do provedor para transformar uma linha de resultado
         em uma GenericLLMResponse.
@@ -57,6 +261,24 @@ class LLMClient(ABC):
         pass
 
 
+def _build_http_client() -> "httpx.Client":
+    """
+    Cliente HTTP compartilhado pelo SDK: pool de conexões keep-alive (sem novo handshake TLS a cada
+    consulta de status) e HTTP/2 quando o pacote h2 está disponível.
+    """
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        follow_redirects=True,
+    )
+
+
 class OpenAIBatchClient(LLMClient):
     def __init__(self, client_override=None):
         if client_override is not None:
@@ -64,27 +286,78 @@ class OpenAIBatchClient(LLMClient):
         else:
             if OpenAI is None:
                 raise ImportError("OpenAI SDK não está instalado. Execute `pip install openai`.")
-            self.client = OpenAI()
+            self.client = OpenAI(http_client=_build_http_client())
 
         self.request_formatter: IBatchRequestFormatter = OpenAIBatchRequestFormatter()
         self.response_parser: IBatchResponseParser = OpenAIBatchResponseParser()
+        self._status_breaker = _CircuitBreaker(STATUS_BREAKER_FAIL_MAX, STATUS_BREAKER_RESET_SECONDS)
+        # Consultas de status com timeout curto e sem os retries internos do SDK: o retry é o de get_batch_status
+        self._status_client = (
+            self.client.with_options(timeout=STATUS_REQUEST_TIMEOUT_SECONDS, max_retries=0)
+            if hasattr(self.client, "with_options") else self.client
+        )
 
-    def prepare_and_upload_batch_file(
+    def format_batch_file(
         self,
         generic_requests: List[GenericLLMRequest],
         batch_input_file_path: Path,
         batch_endpoint_url: str = "/v1/chat/completions"
-    ) -> str:
+    ) -> None:
         self.request_formatter.format_requests_to_file(
             generic_requests,
             batch_input_file_path,
             batch_endpoint_url
         )
 
-        with open(batch_input_file_path, 'rb') as f:
+    def upload_batch_file(self, batch_input_file_path: Path) -> str:
+        file_size = batch_input_file_path.stat().st_size
+        if file_size > MULTIPART_UPLOAD_THRESHOLD and hasattr(self.client, "uploads"):
+            try:
+                return self._upload_multipart(batch_input_file_path, file_size)
+            except Exception as e:
+                logger.warning("Upload em partes de %s falhou (%s). Tentando upload único.", batch_input_file_path, e)
+
+        with open(batch_input_file_path, 'rb', buffering=UPLOAD_READ_BUFFER_SIZE) as f:
+            if hasattr(os, "posix_fadvise"):
+                # Leitura sequencial: o kernel pode fazer read-ahead agressivo
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
             file_obj = self.client.files.create(file=f, purpose='batch')
         return file_obj.id
 
+    def _upload_multipart(self, batch_input_file_path: Path, file_size: int) -> str:
+        """Envia o arquivo em partes paralelas; uma falha transitória refaz só a parte afetada."""
+        upload = self.client.uploads.create(
+            bytes=file_size,
+            filename=batch_input_file_path.name,
+            mime_type="text/jsonl",
+            purpose="batch"
+        )
+
+        def _send_part(offset: int) -> str:
+            with open(batch_input_file_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(MULTIPART_PART_SIZE)
+            for attempt in range(1, MULTIPART_PART_ATTEMPTS + 1):
+                try:
+                    return self.client.uploads.parts.create(upload.id, data=data).id
+                except Exception as e:
+                    if attempt == MULTIPART_PART_ATTEMPTS or not _is_transient_api_error(e):
+                        raise
+                    time.sleep(2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+        try:
+            with ThreadPoolExecutor(max_workers=MULTIPART_MAX_WORKERS) as executor:
+                part_ids = list(executor.map(_send_part, range(0, file_size, MULTIPART_PART_SIZE)))
+            completed = self.client.uploads.complete(upload.id, part_ids=part_ids)
+        except Exception:
+            try:
+                self.client.uploads.cancel(upload.id)
+            except Exception as cancel_err:
+                logger.warning("Falha ao cancelar upload %s: %s", upload.id, cancel_err)
+            raise
+        logger.info("Upload em %d partes concluído para %s: %s", len(part_ids), batch_input_file_path, completed.file.id)
+        return completed.file.id
+
     def create_batch_job(self, input_file_id: str, endpoint: str, metadata: dict) -> str:
         batch_job = self.client.batches.create(
             input_file_id=input_file_id,
@@ -94,25 +367,232 @@ class OpenAIBatchClient(LLMClient):
         )
         return batch_job.id
 
-    def get_batch_status(self, batch_id: str) -> Tuple[str, Optional[str], Optional[str]]:
+    def get_batch_status(self, batch_id: str) -> BatchStatus:
+        """
+        Erros transitórios são refeitos até STATUS_MAX_ATTEMPTS vezes com backoff curto + jitter, dentro
+        do timeout do trigger do Airflow; se persistirem (ou o circuit breaker estiver aberto) retorna
+        status "api_error" e o trigger consulta de novo no próximo poke.
+        Erros definitivos (auth, batch inexistente, 4xx) são propagados.
+        """
+        for attempt in range(1, STATUS_MAX_ATTEMPTS + 1):
+            if not self._status_breaker.allow():
+                logger.warning("Circuit breaker aberto: consulta de status do batch %s não enviada.", batch_id)
+                return BatchStatus("api_error", None, None)
+            try:
+                batch_job = self._status_client.batches.retrieve(batch_id)
+            except Exception as e:
+                if not _is_transient_api_error(e):
+                    # A API respondeu: o erro é do pedido, não da disponibilidade do serviço
+                    self._status_breaker.record_success()
+                    raise
+                self._status_breaker.record_failure()
+                if attempt == STATUS_MAX_ATTEMPTS:
+                    logger.error("Erro ao verificar status do batch OpenAI %s após %d tentativa(s): %s", batch_id, attempt, e)
+                    return BatchStatus("api_error", None, None)
+                delay = min(STATUS_RETRY_MAX_DELAY_SECONDS, 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                logger.warning("Erro transitório ao consultar batch %s (%s). Nova tentativa em %.1fs.", batch_id, e, delay)
+                time.sleep(delay)
+            else:
+                self._status_breaker.record_success()
+                return BatchStatus(batch_job.status, batch_job.output_file_id, batch_job.error_file_id)
+
+    def get_batch_statuses(self, batch_ids: Iterable[str]) -> Dict[str, BatchStatus]:
+        remaining = set(batch_ids)
+        if len(remaining) <= 1:
+            # Um único batch: retrieve é uma só requisição, sem paginar a listagem
+            return super().get_batch_statuses(remaining)
+
+        statuses: Dict[str, BatchStatus] = {}
+        # Batches de um mesmo job são recentes: ceil(N/100) + 1 páginas bastam. O limite evita percorrer
+        # todo o histórico da organização quando algum id não aparece (antigo, de outro projeto, digitado errado).
+        max_scanned = (math.ceil(len(remaining) / BATCH_LIST_PAGE_SIZE) + 1) * BATCH_LIST_PAGE_SIZE
         try:
-            batch_job = self.client.batches.retrieve(batch_id)
-            return batch_job.status, batch_job.output_file_id, batch_job.error_file_id
+            # Listagem paginada (mais recentes primeiro) em vez de um retrieve por batch
+            listed = self.client.batches.list(limit=BATCH_LIST_PAGE_SIZE)
+            for batch_job in itertools.islice(listed, max_scanned):
+                if batch_job.id in remaining:
+                    statuses[batch_job.id] = BatchStatus(batch_job.status, batch_job.output_file_id, batch_job.error_file_id)
+                    remaining.discard(batch_job.id)
+                    if not remaining:
+                        break
         except Exception as e:
-            logging.error(f"Erro ao verificar status do batch OpenAI {batch_id}: {e}")
+            logger.error("Erro ao listar batches OpenAI para consulta de status em lote: %s", e)
 
-            return "api_error", None, None
+        # Não encontrados nas primeiras páginas (ou listagem falhou): consulta individual
+        statuses.update(super().get_batch_statuses(remaining))
+        return statuses
 
 
-    def read_file(self, file_id: str) -> bytes:
-        return self.client.files.content(file_id).read()
+    def iter_file(self, file_id: str, chunk_size: int = FILE_CHUNK_SIZE) -> Iterator[bytes]:
+        with self.client.files.with_streaming_response.content(file_id) as response:
+            yield from response.iter_bytes(chunk_size)
 
-    def parse_llm_batch_line(self, line_content: str) -> GenericLLMResponse:
+    def parse_llm_batch_line(self, line_content: Union[str, bytes]) -> GenericLLMResponse:
         return self.response_parser.parse_batch_output_line(line_content)
 
 
+class ForwardingLLMClient(LLMClient):
+    """Base para decorators de LLMClient: delega tudo ao cliente interno; subclasses sobrescrevem o que precisam."""
+
+    def __init__(self, inner: LLMClient):
+        self.inner = inner
+
+    def format_batch_file(self, generic_requests: List[GenericLLMRequest], batch_input_file_path: Path,
+                          batch_endpoint_url: str = "/v1/chat/completions") -> None:
+        self.inner.format_batch_file(generic_requests, batch_input_file_path, batch_endpoint_url)
+
+    def upload_batch_file(self, batch_input_file_path: Path) -> str:
+        return self.inner.upload_batch_file(batch_input_file_path)
+
+    def create_batch_job(self, input_file_id: str, endpoint: str, metadata: dict) -> str:
+        return self.inner.create_batch_job(input_file_id, endpoint, metadata)
+
+    def get_batch_status(self, batch_id: str) -> BatchStatus:
+        return self.inner.get_batch_status(batch_id)
+
+    def get_batch_statuses(self, batch_ids: Iterable[str]) -> Dict[str, BatchStatus]:
+        return self.inner.get_batch_statuses(batch_ids)
+
+    def iter_file(self, file_id: str, chunk_size: int = FILE_CHUNK_SIZE) -> Iterator[bytes]:
+        return self.inner.iter_file(file_id, chunk_size)
+
+    def parse_llm_batch_line(self, line_content: Union[str, bytes]) -> GenericLLMResponse:
+        return self.inner.parse_llm_batch_line(line_content)
+
+
+class CachingLLMClient(ForwardingLLMClient):
+    """
+    Decorator de LLMClient com cache em disco entre execuções (retries do Airflow, reprocessamentos):
+    - upload: arquivo com o mesmo conteúdo (hash blake2b) reaproveita o file_id já enviado;
+    - conteúdo: arquivos do provedor são imutáveis por file_id, então ficam guardados localmente.
+    Entradas expiram após ttl_seconds.
+    """
+
+    def __init__(self, inner: LLMClient, cache_dir: Path, ttl_seconds: int = LLM_CACHE_TTL_SECONDS):
+        super().__init__(inner)
+        self.ttl_seconds = ttl_seconds
+        self._hash_memo: Dict[Tuple[str, int, int], str] = {}
+        self.files_dir = cache_dir / "files"
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = cache_dir / "uploads.sqlite3"
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "content_hash TEXT PRIMARY KEY, file_id TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _file_hash(self, path: Path) -> str:
+        # Arquivo inalterado (mesmo tamanho/mtime) não é relido para recalcular o hash
+        stat = path.stat()
+        memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+        if memo_key in self._hash_memo:
+            return self._hash_memo[memo_key]
+
+        digest = hashlib.blake2b(digest_size=16)
+        # Um único buffer reaproveitado via readinto: sem alocar um bytes por chunk
+        buffer = bytearray(FILE_CHUNK_SIZE)
+        view = memoryview(buffer)
+        with open(path, 'rb', buffering=0) as f:
+            while n := f.readinto(buffer):
+                digest.update(view[:n])
+        self._hash_memo[memo_key] = digest.hexdigest()
+        return self._hash_memo[memo_key]
+
+    def _is_fresh(self, created_at: float) -> bool:
+        return time.time() - created_at < self.ttl_seconds
+
+    def upload_batch_file(self, batch_input_file_path: Path) -> str:
+        content_hash = self._file_hash(batch_input_file_path)
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            row = conn.execute(
+                "SELECT file_id, created_at FROM uploads WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        if row and self._is_fresh(row[1]):
+            logger.info("Cache hit de upload para %s (hash %s): file_id %s.", batch_input_file_path, content_hash, row[0])
+            return row[0]
+
+        file_id = self.inner.upload_batch_file(batch_input_file_path)
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads (content_hash, file_id, created_at) VALUES (?, ?, ?)",
+                (content_hash, file_id, time.time())
+            )
+        return file_id
+
+    def iter_file(self, file_id: str, chunk_size: int = FILE_CHUNK_SIZE) -> Iterator[bytes]:
+        cached_path = self.files_dir / file_id
+        if cached_path.is_file() and self._is_fresh(cached_path.stat().st_mtime):
+            logger.debug("Cache hit de conteúdo para file_id %s.", file_id)
+            with open(cached_path, 'rb') as f:
+                yield from iter(lambda: f.read(chunk_size), b'')
+            return
+
+        # Grava em arquivo temporário e só publica no cache quando o download termina por completo
+        tmp_path = cached_path.with_name(f"{file_id}.{os.getpid()}.part")
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in self.inner.iter_file(file_id, chunk_size):
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, cached_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+
+class RateLimitedLLMClient(ForwardingLLMClient):
+    """
+    Decorator que limita a criação de batches a `rps` por segundo (token bucket, seguro entre threads)
+    e refaz a chamada com backoff exponencial + jitter quando o provedor responde 429.
+    """
+
+    def __init__(self, inner: LLMClient, rps: float = LLM_BATCH_CREATE_RPS,
+                 max_retries: int = LLM_RATE_LIMIT_MAX_RETRIES):
+        super().__init__(inner)
+        self.rps = rps
+        self.capacity = max(1.0, rps)
+        self.max_retries = max_retries
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rps)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rps
+            time.sleep(wait)
+
+    def create_batch_job(self, input_file_id: str, endpoint: str, metadata: dict) -> str:
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                return self.inner.create_batch_job(input_file_id, endpoint, metadata)
+            except Exception as e:
+                if RateLimitError is None or not isinstance(e, RateLimitError) or attempt == self.max_retries:
+                    raise
+                delay = min(60.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning("Rate limit ao criar batch (tentativa %d). Nova tentativa em %.1fs.", attempt + 1, delay)
+                time.sleep(delay)
+
+
+@functools.lru_cache(maxsize=None)
+def _build_llm_strategy(client_override) -> LLMClient:
+    strategy: LLMClient = OpenAIBatchClient(client_override=client_override)
+    if LLM_BATCH_CREATE_RPS > 0:
+        strategy = RateLimitedLLMClient(strategy)
+    if LLM_CACHE_DIR:
+        strategy = CachingLLMClient(strategy, Path(LLM_CACHE_DIR))
+    return strategy
+
+
 def get_llm_strategy() -> LLMClient:
-    """Cria e retorna uma estratégia LLM."""
-    if OPENAI_CLIENT_INSTANCE is not None:
-        return OpenAIBatchClient(client_override=OPENAI_CLIENT_INSTANCE)
-    return OpenAIBatchClient()
+    """
+    Retorna a estratégia LLM do processo. A instância é reaproveitada entre chamadas (pool de conexões
+    HTTP e token bucket compartilhados); falhas na criação não ficam em cache.
+    """
+    return _build_llm_strategy(OPENAI_CLIENT_INSTANCE)
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional, TypedDict
+from typing import List, Dict, Any, Optional, TypedDict, Union, NamedTuple
 from abc import ABC, abstractmethod
 from pathlib import Path
 
@@ -23,6 +23,11 @@ class GenericLLMResponse(TypedDict):
     error_message: Optional[str]
     raw_response_data: Optional[Dict[str, Any]]
 
+class BatchStatus(NamedTuple):
+    status: str
+    output_file_id: Optional[str]
+    error_file_id: Optional[str]
+
 class IBatchRequestFormatter(ABC):
     @abstractmethod
     def format_requests_to_file(
@@ -41,7 +46,7 @@ class IBatchResponseParser(ABC):
     @abstractmethod
     def parse_batch_output_line(
             self,
-            line_content: str
+            line_content: Union[str, bytes]
     ) -> GenericLLMResponse:
         """
         Parseia uma linha do arquivo de resultado do batch do provedor
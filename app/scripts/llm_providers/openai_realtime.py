@@ -0,0 +1,71 @@
+"""
+Caminho em tempo real (sem Batch API): envia as linhas de um arquivo de batch já formatado
+como chamadas concorrentes a chat.completions e grava as respostas no formato de saída da
+Batch API, para que o mesmo parser/processador de resultados seja reaproveitado.
+"""
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, List
+
+import orjson
+
+try:
+    from openai import AsyncOpenAI
+except ImportError:
+    AsyncOpenAI = None
+
+logger = logging.getLogger(__name__)
+
+# Retries do SDK (backoff exponencial em 408/409/429/5xx e erros de conexão) por request
+REALTIME_MAX_RETRIES = 5
+
+
+async def _complete_one(
+        client: "AsyncOpenAI",
+        semaphore: asyncio.Semaphore,
+        batch_request: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Executa um request do arquivo de batch e devolve a linha equivalente da saída da Batch API."""
+    custom_id = batch_request.get("custom_id")
+    async with semaphore:
+        try:
+            completion = await client.chat.completions.create(**batch_request["body"])
+        except Exception as e:
+            logger.warning("Request %s falhou no caminho em tempo real: %s", custom_id, e)
+            return {"custom_id": custom_id, "response": None, "error": {"message": str(e)}}
+    return {
+        "custom_id": custom_id,
+        "response": {"status_code": 200, "body": completion.model_dump()},
+        "error": None,
+    }
+
+
+async def _complete_all(batch_requests: List[Dict[str, Any]], max_concurrency: int) -> List[Dict[str, Any]]:
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with AsyncOpenAI(max_retries=REALTIME_MAX_RETRIES) as client:
+        return await asyncio.gather(*(_complete_one(client, semaphore, req) for req in batch_requests))
+
+
+def run_batch_file_realtime(batch_input_file_path: Path, output_file_path: Path, max_concurrency: int) -> int:
+    """
+    Executa todos os requests de batch_input_file_path com até max_concurrency chamadas simultâneas
+    e grava output_file_path no formato de saída da Batch API. Retorna o número de requests com erro.
+    Deve ser chamado fora de um event loop em execução (usa asyncio.run).
+    """
+    if AsyncOpenAI is None:
+        raise ImportError("OpenAI SDK não está instalado. Execute `pip install openai`.")
+
+    with open(batch_input_file_path, 'rb') as f:
+        batch_requests = [orjson.loads(line) for line in f if not line.isspace()]
+    logger.info("Executando %d requests em tempo real (concorrência %d).", len(batch_requests), max_concurrency)
+
+    output_lines = asyncio.run(_complete_all(batch_requests, max_concurrency))
+
+    output_file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file_path, 'wb', buffering=1 << 20) as f:
+        f.writelines(orjson.dumps(line) + b'\n' for line in output_lines)
+
+    failed = sum(1 for line in output_lines if line["error"] is not None)
+    logger.info("Respostas em tempo real gravadas em %s (%d com erro).", output_file_path, failed)
+    return failed
@@ -1,7 +1,8 @@
-import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Union
+
+import orjson
 
 from app.scripts.llm_core.models import (
     GenericLLMRequest, GenericLLMResponse,
@@ -9,6 +10,9 @@ from app.scripts.llm_core.models import (
 )
 from app.scripts.constants import LLM_MODEL
 
+# custom_id = prefixo + request_metadata serializado em JSON
+CUSTOM_ID_META_PREFIX = "gr_meta::"
+
 
 class OpenAIBatchRequestFormatter(IBatchRequestFormatter):
     def format_requests_to_file(
@@ -17,50 +21,60 @@ class OpenAIBatchRequestFormatter(IBatchRequestFormatter):
         output_file_path: Path,
         batch_endpoint_url: str = "/v1/chat/completions"
     ) -> None:
-        openai_batch_requests = []
-        for req in generic_requests:
-            custom_id_str = f"gr_meta::{json.dumps(req['request_metadata'])}"
-
-            body = {
-                "model": req['config'].get('model_name') or LLM_MODEL,
-                "messages": req['messages'],
-            }
-            if req['config'].get('temperature') is not None:
-                body["temperature"] = req['config']['temperature']
-            if req['config'].get('response_format'):
-                body["response_format"] = req['config']['response_format']
-            if req['config'].get('max_tokens'):
-                 body["max_tokens"] = req['config']['max_tokens']
+        # Partes constantes serializadas uma vez: por request só custom_id e messages passam pelo encoder
+        line_prefix = b'"method":"POST","url":' + orjson.dumps(batch_endpoint_url) + b',"body":'
+        body_prefixes: Dict[Tuple[Any, ...], bytes] = {}
 
-            openai_batch_requests.append({
-                "custom_id": custom_id_str,
-                "method": "POST",
-                "url": batch_endpoint_url,
-                "body": body
-            })
+        def _body_prefix(config: Dict[str, Any]) -> bytes:
+            key = (
+                config.get('model_name') or LLM_MODEL,
+                config.get('temperature'),
+                orjson.dumps(config.get('response_format')) if config.get('response_format') else None,
+                config.get('max_tokens') or None,
+            )
+            prefix = body_prefixes.get(key)
+            if prefix is None:
+                body_skeleton: Dict[str, Any] = {"model": key[0]}
+                if config.get('temperature') is not None:
+                    body_skeleton["temperature"] = config['temperature']
+                if config.get('response_format'):
+                    body_skeleton["response_format"] = config['response_format']
+                if config.get('max_tokens'):
+                    body_skeleton["max_tokens"] = config['max_tokens']
+                # Sem o '}' final: "messages" é concatenado por request
+                prefix = body_prefixes[key] = orjson.dumps(body_skeleton)[:-1] + b',"messages":'
+            return prefix
 
         output_file_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_file_path, 'w', encoding='utf-8') as f:
-            for item in openai_batch_requests:
-                f.write(json.dumps(item) + '\n')
-        logging.info(f"Salvo JSONL para OpenAI Batch API em {output_file_path} com {len(openai_batch_requests)} requests.")
+        with open(output_file_path, 'wb', buffering=1 << 20) as f:
+            f.writelines(
+                b'{"custom_id":'
+                + orjson.dumps(f"{CUSTOM_ID_META_PREFIX}{orjson.dumps(req['request_metadata']).decode()}")
+                + b','
+                + line_prefix
+                + _body_prefix(req['config'])
+                + orjson.dumps(req['messages'])
+                + b'}}\n'
+                for req in generic_requests
+            )
+        logging.info(f"Salvo JSONL para OpenAI Batch API em {output_file_path} com {len(generic_requests)} requests.")
 
 
 class OpenAIBatchResponseParser(IBatchResponseParser):
     def parse_batch_output_line(
         self,
-        line_content: str
+        line_content: Union[str, bytes]
     ) -> GenericLLMResponse:
-        line_data = json.loads(line_content)
+        line_data = orjson.loads(line_content)
         openai_custom_id = line_data.get("custom_id")
         response_payload = line_data.get("response")
         error_payload = line_data.get("error")
 
         parsed_request_metadata: Dict[str, Any] = {}
-        if openai_custom_id and openai_custom_id.startswith("gr_meta::"):
+        if openai_custom_id and openai_custom_id.startswith(CUSTOM_ID_META_PREFIX):
             try:
-                parsed_request_metadata = json.loads(openai_custom_id[len("gr_meta::"):])
-            except json.JSONDecodeError:
+                parsed_request_metadata = orjson.loads(openai_custom_id[len(CUSTOM_ID_META_PREFIX):])
+            except orjson.JSONDecodeError:
                 logging.error(f"Falha ao desserializar request_metadata do custom_id: {openai_custom_id}")
                 parsed_request_metadata = {"error": "failed_to_parse_custom_id", "original_custom_id": openai_custom_id}
         elif openai_custom_id:
@@ -1,10 +1,11 @@
 import pandas as pd
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Tuple, Set, Optional
+from typing import List, Dict, Any, Tuple, Optional, Union
 from abc import ABC, abstractmethod
 from app.scripts.constants import BLOOM_ORDER, BLOOM_ORDER_MAP
 from app.scripts.io_utils import save_dataframe, load_dataframe
+from app.scripts.rel_utils import name_id_map
 
 class OriginSelector(ABC):
     """Interface para seleção de origens de UC."""
@@ -33,16 +34,28 @@ class HubNeighborSelector(OriginSelector):
         return _select_origins_for_testing(all_origins, self.graphrag_output_dir, self.max_origins)
 
 
+def _column_or_default(df: pd.DataFrame, column: str, default: Any) -> pd.Series:
+    """Retorna a coluna do DataFrame ou uma Series constante com o default, se ausente."""
+    if column in df.columns:
+        return df[column]
+    return pd.Series(default, index=df.index, dtype=object)
+
+def _optional_str(series: pd.Series) -> pd.Series:
+    """Converte valores para str, mantendo None para nulos/vazios (equivale a `str(x) if x else None`)."""
+    present = series.notna() & series.astype(bool)
+    return series.astype(str).astype(object).where(present, None)
+
 def prepare_uc_origins(
-        enriched_entities: List[Dict[str, Any]],
-        community_reports_list: List[Dict[str, Any]],
+        enriched_entities: Union[pd.DataFrame, List[Dict[str, Any]]],
+        community_reports_list: Union[pd.DataFrame, List[Dict[str, Any]]],
         community_structures_list: List[Dict[str, Any]],
         hr_id_to_uuid_map: Dict[str, str]
 ) -> List[Dict[str, Any]]:
     """
     Prepara a lista de 'origens' para a geração de UCs, incluindo o parent_community_id_of_origin.
+    Entidades e relatórios são processados com operações vetorizadas do pandas e
+    convertidos para dicts apenas no final.
     """
-    uc_origins: List[Dict[str, Any]] = []
     logging.info("Preparando origens de UC...")
 
     community_uuid_to_parent_uuid_map: Dict[str, Optional[str]] = {}
@@ -52,60 +65,68 @@ def prepare_uc_origins(
         if cs_uuid:
             community_uuid_to_parent_uuid_map[str(cs_uuid)] = str(cs_parent_uuid) if cs_parent_uuid else None
 
-    if enriched_entities:
-        logging.info(f"Processando {len(enriched_entities)} entidades enriquecidas para origens...")
-        for entity_rec in enriched_entities:
-            parent_community_id_for_entity_origin = entity_rec.get('parent_community_id')
-            uc_origins.append({
-                "origin_id": entity_rec.get("id"),
-                "origin_type": "entity",
-                "title": entity_rec.get("title"),
-                "context": entity_rec.get("description", ""),
-                "frequency": int(entity_rec.get("frequency", 0)),
-                "degree": int(entity_rec.get("degree", 0)),
-                "entity_type": entity_rec.get("type", "unknown"),
-                "level": 0,
-                "parent_community_id_of_origin": str(
-                    parent_community_id_for_entity_origin) if parent_community_id_for_entity_origin else None
-            })
-
-    if community_reports_list:
-        logging.info(f"Processando {len(community_reports_list)} relatórios de comunidade para origens...")
-        for report_rec in community_reports_list:
-            report_community_hr_id_val = report_rec.get("community")
-            report_title = report_rec.get("title", "Relatório Sem Título")
-            parent_id_for_this_report_origin = None
-            origin_id_for_report = None  # Inicializa para evitar UnboundLocalError
-
-            if pd.notna(report_community_hr_id_val):
-                report_community_hr_id_str = str(int(report_community_hr_id_val)) if pd.api.types.is_number(
-                    report_community_hr_id_val) else str(report_community_hr_id_val)
-                report_community_uuid = hr_id_to_uuid_map.get(report_community_hr_id_str)
-
-                if report_community_uuid:
-                    origin_id_for_report = str(report_community_uuid)  # Define o origin_id corretamente
-                    parent_id_for_this_report_origin = community_uuid_to_parent_uuid_map.get(origin_id_for_report)
-                else:
-                    logging.warning(
-                        f"Relatório '{report_title}' tem community_hr_id '{report_community_hr_id_str}' não mapeado para UUID. Pulando origem.")
-                    continue
-            else:
-                logging.warning(f"Relatório '{report_title}' não tem 'community' (human_readable_id). Pulando origem.")
-                continue
-
-            uc_origins.append({
-                "origin_id": origin_id_for_report,
-                "origin_type": "community_report",
-                "title": report_title,
-                "context": report_rec.get("summary", ""),
-                "frequency": 0,
-                "degree": 0,
-                "entity_type": "community",
-                "level": int(report_rec.get("level", 99)),
-                "parent_community_id_of_origin": str(
-                    parent_id_for_this_report_origin) if parent_id_for_this_report_origin else None
-            })
+    origin_frames: List[pd.DataFrame] = []
+
+    entities_df = pd.DataFrame(enriched_entities)
+    if not entities_df.empty:
+        logging.info(f"Processando {len(entities_df)} entidades enriquecidas para origens...")
+        origin_frames.append(pd.DataFrame({
+            "origin_id": _column_or_default(entities_df, "id", None),
+            "origin_type": "entity",
+            "title": _column_or_default(entities_df, "title", None),
+            "context": _column_or_default(entities_df, "description", "").fillna(""),
+            "frequency": _column_or_default(entities_df, "frequency", 0).fillna(0).astype("int64"),
+            "degree": _column_or_default(entities_df, "degree", 0).fillna(0).astype("int64"),
+            "entity_type": _column_or_default(entities_df, "type", "unknown").fillna("unknown"),
+            "level": 0,
+            "parent_community_id_of_origin": _optional_str(
+                _column_or_default(entities_df, "parent_community_id", None)),
+        }))
+
+    reports_df = pd.DataFrame(community_reports_list)
+    if not reports_df.empty:
+        logging.info(f"Processando {len(reports_df)} relatórios de comunidade para origens...")
+        hr_ids = _column_or_default(reports_df, "community", None)
+        has_hr_id = hr_ids.notna()
+        if not has_hr_id.all():
+            logging.warning(
+                f"{int((~has_hr_id).sum())} relatório(s) sem 'community' (human_readable_id). Pulando essas origens.")
+
+        reports_df = reports_df[has_hr_id]
+        hr_ids = hr_ids[has_hr_id]
+        if pd.api.types.is_numeric_dtype(hr_ids):
+            hr_id_strs = hr_ids.astype("int64").astype(str)
+        else:
+            hr_id_strs = hr_ids.map(lambda v: str(int(v)) if pd.api.types.is_number(v) else str(v))
+        report_uuids = hr_id_strs.map(hr_id_to_uuid_map)
+
+        is_mapped = report_uuids.notna() & report_uuids.astype(bool)
+        if not is_mapped.all():
+            unmapped = hr_id_strs[~is_mapped]
+            logging.warning(
+                f"{len(unmapped)} relatório(s) com community_hr_id não mapeado para UUID "
+                f"({', '.join(unmapped.head(10))}). Pulando essas origens.")
+
+        reports_df = reports_df[is_mapped]
+        report_uuids = report_uuids[is_mapped].astype(str)
+        origin_frames.append(pd.DataFrame({
+            "origin_id": report_uuids,
+            "origin_type": "community_report",
+            "title": _column_or_default(reports_df, "title", "Relatório Sem Título"),
+            "context": _column_or_default(reports_df, "summary", ""),
+            "frequency": 0,
+            "degree": 0,
+            "entity_type": "community",
+            "level": _column_or_default(reports_df, "level", 99).astype("int64"),
+            "parent_community_id_of_origin": _optional_str(report_uuids.map(community_uuid_to_parent_uuid_map)),
+        }))
+
+    origin_frames = [frame for frame in origin_frames if not frame.empty]
+    if not origin_frames:
+        logging.info("Total 0 origens de UC preparadas.")
+        return []
 
+    uc_origins = pd.concat(origin_frames, ignore_index=True).to_dict("records")
     logging.info(f"Total {len(uc_origins)} origens de UC preparadas.")
     return uc_origins
 
@@ -148,30 +169,26 @@ def _select_origins_for_testing(
     hub_origin = entity_origins[0]
     hub_id = hub_origin.get("origin_id")
     logging.info(f"Hub selecionado: ID={hub_id}, Title='{hub_origin.get('title')[:50]}...'")
-    neighbor_ids: Set[str] = set()
+    neighbor_ids: List[str] = []
     # Carrega DataFrames dinamicamente para permitir monkeypatch em pipeline_tasks
-    relationships_df = load_dataframe(graphrag_output_dir, "relationships")
-    entities_df = load_dataframe(graphrag_output_dir, "entities")
+    relationships_df = load_dataframe(graphrag_output_dir, "relationships", columns=["source", "target"])
+    entities_df = load_dataframe(graphrag_output_dir, "entities", columns=["id", "title"])
     if relationships_df is not None and entities_df is not None:
-        entity_name_to_id: Dict[str, str] = {}
-        if 'title' in entities_df.columns and 'id' in entities_df.columns:
-            entity_name_to_id = pd.Series(entities_df.id.values, index=entities_df.title).to_dict()
+        entity_name_to_id = name_id_map(entities_df)
         if entity_name_to_id and 'source' in relationships_df.columns and 'target' in relationships_df.columns:
             logging.info(f"Buscando vizinhos do Hub (ID: {hub_id})...")
-            for row in relationships_df.itertuples(index=False):
-                s_id = entity_name_to_id.get(row.source)
-                t_id = entity_name_to_id.get(row.target)
-                if s_id == hub_id and t_id and t_id != hub_id:
-                    neighbor_ids.add(t_id)
-                elif t_id == hub_id and s_id and s_id != hub_id:
-                    neighbor_ids.add(s_id)
+            s_ids = relationships_df['source'].map(entity_name_to_id)
+            t_ids = relationships_df['target'].map(entity_name_to_id)
+            # Vizinho = o outro lado de cada relação que toca o hub (ignora não mapeados e self-loops)
+            candidates = pd.concat([t_ids[s_ids == hub_id], s_ids[t_ids == hub_id]]).dropna()
+            neighbor_ids = [n for n in pd.unique(candidates) if n and n != hub_id]
         else:
             logging.warning("Não buscou vizinhos (mapa nome->ID ou colunas).")
     else:
         logging.warning("Não carregou relationships/entities para buscar vizinhos.")
     logging.info(f"Encontrados {len(neighbor_ids)} vizinhos únicos.")
     final_ids_to_process = {hub_id}
-    neighbors_to_add = list(neighbor_ids)[: max_origins - 1]
+    neighbors_to_add = neighbor_ids[: max_origins - 1]
     final_ids_to_process.update(neighbors_to_add)
     logging.info(f"Conjunto final teste: {len(final_ids_to_process)} IDs.")
     selected_origins = [o for o in all_origins if o.get("origin_id") in final_ids_to_process]
@@ -26,9 +26,11 @@ def task_define_relationships(run_id: str):
                 return
 
             logging.info("Carregando dados necessários do banco para definir relações...")
-            generated_ucs_records = crud_generated_ucs_raw.get_generated_ucs_raw(db, run_id)
-            graphrag_rels_records = crud_graphrag_relationships.get_relationships(db, run_id)
-            graphrag_ents_records = crud_graphrag_entities.get_entities(db, run_id)
+            generated_ucs_records = crud_generated_ucs_raw.get_generated_ucs_raw(
+                db, run_id, columns=['uc_id', 'origin_id', 'bloom_level'])
+            graphrag_rels_records = crud_graphrag_relationships.get_relationships(
+                db, run_id, columns=['source', 'target', 'weight', 'description'])
+            graphrag_ents_records = crud_graphrag_entities.get_entities(db, run_id, columns=['id', 'title'])
 
             if not generated_ucs_records:
                 raise ValueError(
@@ -46,7 +48,7 @@ def task_define_relationships(run_id: str):
             entities_df_graphrag = pd.DataFrame(graphrag_ents_records if graphrag_ents_records else [])
 
             context_for_builders = {
-                'generated_ucs': generated_ucs_df.to_dict('records'),
+                'generated_ucs_df': generated_ucs_df,
                 'relationships_df': relationships_df_graphrag,
                 'entities_df': entities_df_graphrag
             }
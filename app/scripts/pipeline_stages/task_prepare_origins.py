@@ -3,6 +3,7 @@ from pathlib import Path
 from typing import List, Dict, Any, Tuple
 import logging
 import json
+import math
 import numpy as np
 
 from app.db import get_session
@@ -15,7 +16,7 @@ import app.crud.graphrag_entities as crud_graphrag_entities
 import app.crud.graphrag_relationships as crud_graphrag_relationships
 import app.crud.graphrag_text_units as crud_graphrag_text_units
 
-from app.scripts.io_utils import load_dataframe
+from app.scripts.io_utils import load_dataframe, iter_dataframe
 from app.scripts.origins_utils import prepare_uc_origins
 from app.scripts.constants import AIRFLOW_DATA_DIR
 
@@ -35,19 +36,37 @@ def _get_dirs(run_id: str):
 
     return base_input_for_graphrag, work_dir_for_batches, batch_files_dir, s1, s2, s3, s4, s5
 
+def _is_null(value: Any) -> bool:
+    """Equivalente a `not pd.notna(value)` para escalares, sem passar pelo dispatch do pandas."""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def _hr_id_strings(values: pd.Series) -> pd.Series:
+    """human_readable_id como str (números sem '.0'), com None onde o valor é nulo."""
+    present = values.notna()
+    hr_id_strs = pd.Series(None, index=values.index, dtype=object)
+    if pd.api.types.is_numeric_dtype(values):
+        hr_id_strs[present] = values[present].astype('int64').astype(str)
+    else:
+        hr_id_strs[present] = values[present].map(
+            lambda v: str(int(v)) if pd.api.types.is_number(v) else str(v))
+    return hr_id_strs
+
 def _build_community_maps(
         actual_communities_df: pd.DataFrame
 ) -> Tuple[Dict[str, str], List[Dict[str, Any]], Dict[str, str]]:
     human_readable_to_uuid_map: Dict[str, str] = {}
     if 'human_readable_id' in actual_communities_df.columns and 'id' in actual_communities_df.columns:
-        for hr_id_val, community_uuid_val in zip(actual_communities_df['human_readable_id'],
-                                                 actual_communities_df['id']):
-            if pd.notna(hr_id_val) and pd.notna(community_uuid_val):
-                hr_id_str = str(int(hr_id_val)) if pd.api.types.is_number(hr_id_val) else str(hr_id_val)
-                human_readable_to_uuid_map[hr_id_str] = str(community_uuid_val)
-            elif pd.notna(community_uuid_val):
-                logging.warning(
-                    f"Comunidade com ID {community_uuid_val} não possui human_readable_id. Não será mapeável como pai por HR_ID.")
+        community_uuids = actual_communities_df['id']
+        hr_id_strs = _hr_id_strings(actual_communities_df['human_readable_id'])
+        has_uuid = community_uuids.notna()
+        has_hr_id = hr_id_strs.notna()
+        missing_hr_id = community_uuids[has_uuid & ~has_hr_id]
+        if not missing_hr_id.empty:
+            logging.warning(
+                f"{len(missing_hr_id)} comunidade(s) sem human_readable_id ({', '.join(missing_hr_id.astype(str).head(10))}). "
+                f"Não serão mapeáveis como pai por HR_ID.")
+        mappable = has_uuid & has_hr_id
+        human_readable_to_uuid_map = dict(zip(hr_id_strs[mappable], community_uuids[mappable].astype(str)))
     else:
         logging.error(
             "'human_readable_id' ou 'id' não encontrados em communities.parquet. Mapas podem estar incompletos.")
@@ -61,17 +80,27 @@ def _build_community_maps(
         'text_unit_ids', 'period', 'size'
     }
 
-    for community_row_tuple in actual_communities_df.itertuples(index=False):
+    # Nulos resolvidos por coluna antes do loop; dentro dele só restam checagens locais
+    if 'id' in actual_communities_df.columns:
+        has_uuid = actual_communities_df['id'].notna()
+    else:
+        has_uuid = pd.Series(False, index=actual_communities_df.index)
+    if not has_uuid.all():
+        logging.error(
+            f"{int((~has_uuid).sum())} registro(s) de comunidade em communities.parquet sem 'id' (UUID). Pulando.")
+    communities_df = actual_communities_df[has_uuid]
+    if 'parent' in communities_df.columns:
+        parent_hr_id_strs = _hr_id_strings(communities_df['parent'])
+    else:
+        parent_hr_id_strs = pd.Series(None, index=communities_df.index, dtype=object)
+
+    for community_row_tuple, parent_hr_id_str in zip(communities_df.itertuples(index=False), parent_hr_id_strs):
         community_db_rec: Dict[str, Any] = {}
 
-        for col_name_from_df in actual_communities_df.columns:
+        for col_name_from_df in communities_df.columns:
             if col_name_from_df in expected_db_cols_for_graphrag_community:
                 community_db_rec[col_name_from_df] = getattr(community_row_tuple, col_name_from_df)
 
-        if not pd.notna(community_db_rec.get('id')):
-            logging.error(f"Registro de comunidade em communities.parquet sem 'id' (UUID). Pulando.")
-            continue
-
         community_uuid_str = str(community_db_rec.get('id'))
         community_title_val = community_db_rec.get('title', f'Comunidade Sem Título {community_uuid_str}')
 
@@ -82,12 +111,6 @@ def _build_community_maps(
                 else:
                     community_db_rec[db_col] = None
 
-        parent_hr_id_val = community_db_rec.get('parent')
-        parent_hr_id_str = None
-        if pd.notna(parent_hr_id_val):
-            parent_hr_id_str = str(int(parent_hr_id_val)) if pd.api.types.is_number(parent_hr_id_val) else str(
-                parent_hr_id_val)
-
         if parent_hr_id_str and parent_hr_id_str in human_readable_to_uuid_map:
             community_db_rec['parent_community_id'] = human_readable_to_uuid_map[parent_hr_id_str]
         else:
@@ -119,7 +142,7 @@ def _build_community_maps(
                     f"'entity_ids' para comunidade {community_uuid_str} tem tipo inesperado: {type(entity_ids_data)}.")
 
             for ent_id_val in parsed_entity_ids_list:
-                if pd.notna(ent_id_val):
+                if not _is_null(ent_id_val):
                     entity_to_community_map[str(ent_id_val)] = community_uuid_str
                 else:
                     logging.warning(f"entity_id nulo na lista de entidades da comunidade {community_uuid_str}.")
@@ -137,19 +160,14 @@ def _enrich_entities_with_community_id(
         logging.warning("DataFrame de entidades vazio ou nulo em _enrich_entities_with_community_id.")
         return processed_entity_records
 
-    for entity_row_tuple in entities_df.itertuples(index=False):
-        entity_rec = entity_row_tuple._asdict()
-        entity_uuid_val = entity_rec.get('id')
-        entity_title_val = entity_rec.get('title', 'Título Desconhecido')
-
-        if not pd.notna(entity_uuid_val):
-            logging.error(f"Registro de entidade sem ID UUID encontrado: {entity_title_val}. Pulando este registro.")
-            continue
+    has_id = entities_df['id'].notna()
+    if not has_id.all():
+        logging.error(f"{int((~has_id).sum())} registro(s) de entidade sem ID UUID encontrado(s). Pulando esses registros.")
 
-        entity_uuid_str = str(entity_uuid_val)
-        entity_rec['parent_community_id'] = entity_to_community_map.get(
-            entity_uuid_str)
-        processed_entity_records.append(entity_rec)
+    enriched_df = entities_df[has_id].copy()
+    parent_ids = enriched_df['id'].astype(str).map(entity_to_community_map)
+    enriched_df['parent_community_id'] = parent_ids.astype(object).where(parent_ids.notna(), None)
+    processed_entity_records = enriched_df.to_dict('records')
     return processed_entity_records
 
 def task_prepare_origins(run_id: str):
@@ -163,7 +181,7 @@ def task_prepare_origins(run_id: str):
 
     with get_session() as db:
         try:
-            existing_graphrag_entities_in_db = crud_graphrag_entities.get_entities(db, run_id)
+            existing_graphrag_entities_in_db = crud_graphrag_entities.get_entities(db, run_id, columns=['id'])
             if existing_graphrag_entities_in_db:
                 logging.info(
                     f"Dados do GraphRAG já parecem ingeridos para run_id={run_id} (verificado por entidades). Pulando ingestão de Parquets.")
@@ -185,9 +203,6 @@ def task_prepare_origins(run_id: str):
             actual_communities_df = load_dataframe(graphrag_output_dir, "communities")
             reports_df = load_dataframe(graphrag_output_dir, "community_reports")
             entities_df_from_parquet = load_dataframe(graphrag_output_dir, "entities")
-            documents_df = load_dataframe(graphrag_output_dir, "documents")
-            relationships_df = load_dataframe(graphrag_output_dir, "relationships")
-            text_units_df = load_dataframe(graphrag_output_dir, "text_units")
 
             if entities_df_from_parquet is None or entities_df_from_parquet.empty:
                 raise ValueError(f"Erro crítico: entities.parquet não encontrado ou vazio em {graphrag_output_dir}.")
@@ -212,12 +227,15 @@ def task_prepare_origins(run_id: str):
             if processed_entity_records:
                 crud_graphrag_entities.add_entities(db, run_id, processed_entity_records)
 
-            if documents_df is not None and not documents_df.empty:
-                crud_graphrag_documents.add_documents(db, run_id, documents_df.to_dict('records'))
-            if relationships_df is not None and not relationships_df.empty:
-                crud_graphrag_relationships.add_relationships(db, run_id, relationships_df.to_dict('records'))
-            if text_units_df is not None and not text_units_df.empty:
-                crud_graphrag_text_units.add_text_units(db, run_id, text_units_df.to_dict('records'))
+            # Tabelas só ingeridas: lidas em blocos para não materializar o Parquet inteiro (Arrow + pandas + dicts)
+            for filename, add_fn in (
+                    ("documents", crud_graphrag_documents.add_documents),
+                    ("relationships", crud_graphrag_relationships.add_relationships),
+                    ("text_units", crud_graphrag_text_units.add_text_units),
+            ):
+                for chunk_df in iter_dataframe(graphrag_output_dir, filename):
+                    if not chunk_df.empty:
+                        add_fn(db, run_id, chunk_df.to_dict('records'))
 
             logging.info("Dados do GraphRAG adicionados à sessão do banco (pendente de commit).")
 
@@ -226,7 +244,7 @@ def task_prepare_origins(run_id: str):
                 logging.info("Preparando Knowledge Unit Origins...")
                 origins_to_save = prepare_uc_origins(
                     processed_entity_records if processed_entity_records else [],
-                    reports_df.to_dict('records') if (reports_df is not None and not reports_df.empty) else [],
+                    reports_df if reports_df is not None else [],
                     processed_community_structure_records if processed_community_structure_records else [],
                     hr_id_to_uuid_map
                 )
@@ -0,0 +1,59 @@
+from typing import Optional
+import logging
+import datetime
+
+from sqlalchemy.orm import Session
+from app.db import get_session
+
+from app.scripts.batch_utils import process_local_results
+from app.scripts.constants import GENERATED_UCS_RAW, OPENAI_MAX_CONCURRENCY, get_dirs
+from app.scripts.llm_client import get_llm_strategy, LLMClient
+from app.scripts.llm_providers.openai_realtime import run_batch_file_realtime
+from app.scripts.pipeline_stages.task_submit_uc_generation_batch import build_uc_generation_requests
+
+REALTIME_BATCH_ID_PREFIX = "realtime"
+
+def task_run_uc_generation_async(run_id: str, db_session_from_api: Optional[Session] = None) -> Optional[str]:
+    """
+    Alternativa à Batch API para runs pequenas/médias: executa os requests de geração UC
+    concorrentemente (até OPENAI_MAX_CONCURRENCY chamadas) e processa as respostas na hora.
+    Usa db_session_from_api se fornecida. NÃO faz commit/rollback se db_session_from_api for usada.
+    Retorna o id sintético da execução, None se nada a processar; levanta exceção em falha.
+    """
+    logging.info(f"--- LOGIC: run_uc_generation_async (run_id={run_id}) ---")
+
+    generic_llm_requests = build_uc_generation_requests(run_id)
+    if not generic_llm_requests:
+        logging.warning(f"Nenhum request LLM genérico preparado para geração de UC (run_id: {run_id}). Nada a executar.")
+        return None
+
+    _, _, batch_files_dir_for_run, _, s2_dir_for_run, _, _, _ = get_dirs(run_id)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    realtime_id = f"{REALTIME_BATCH_ID_PREFIX}_{timestamp}"
+    requests_file_path = batch_files_dir_for_run / f"openai_uc_generation_{realtime_id}_{run_id}.jsonl"
+    responses_file_path = s2_dir_for_run / f"{realtime_id}.jsonl"
+
+    # Mesmo arquivo da Batch API: o formatter e o parser de resultados são reaproveitados
+    llm_client_instance: LLMClient = get_llm_strategy()
+    llm_client_instance.format_batch_file(generic_llm_requests, requests_file_path, "/v1/chat/completions")
+    failed_requests = run_batch_file_realtime(requests_file_path, responses_file_path, OPENAI_MAX_CONCURRENCY)
+    if failed_requests:
+        logging.warning(f"{failed_requests} de {len(generic_llm_requests)} requests falharam no caminho em tempo real.")
+
+    def _core_logic(db: Session) -> bool:
+        return process_local_results(realtime_id, responses_file_path, GENERATED_UCS_RAW, run_id, db)
+
+    if db_session_from_api:
+        success = _core_logic(db_session_from_api)
+    else:
+        with get_session() as db:
+            success = _core_logic(db)
+            if success:
+                db.commit()
+            else:
+                db.rollback()
+
+    if not success:
+        raise RuntimeError(f"Falha ao processar as respostas em tempo real de geração UC (run_id: {run_id}).")
+    logging.info(f"--- LOGIC: run_uc_generation_async CONCLUÍDA (run_id={run_id}, id={realtime_id}) ---")
+    return realtime_id
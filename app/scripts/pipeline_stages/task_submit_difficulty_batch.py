@@ -1,9 +1,10 @@
 from typing import List, Dict, Optional, Any, Tuple
 import logging
-from collections import defaultdict
 import datetime
 import uuid
 
+import pandas as pd
+
 from app.db import get_session
 import app.models as models
 
@@ -12,6 +13,7 @@ import app.crud.generated_ucs_raw as crud_generated_ucs_raw
 
 from app.scripts.llm_client import get_llm_strategy
 from app.scripts.data_lake import DataLake
+from app.scripts.io_utils import load_prompt
 
 from app.crud import difficulty_comparison_group as crud_dcg  # Criar este CRUD
 from app.crud import difficulty_group_origin_association as crud_dga  # Criar este CRUD
@@ -32,6 +34,7 @@ from app.scripts.llm_core.models import ( # Importar de onde você os definiu
     GenericLLMRequest, GenericLLMMessage, GenericLLMRequestConfig
 )
 from app.scripts.llm_client import get_llm_strategy, LLMClient, OpenAIBatchClient
+from app.scripts.batch_utils import submit_batch_file
 
 def task_submit_difficulty_batch(run_id: str) -> Optional[str]:
     """
@@ -51,13 +54,17 @@ def task_submit_difficulty_batch(run_id: str) -> Optional[str]:
                 f"KU Origins não encontradas para run_id={run_id}, mas UCs existem. Não pode submeter para dificuldade.")
             return None
 
-    # Mapear UCs para acesso rápido
-    ucs_by_origin_then_bloom: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(lambda: defaultdict(dict))
-    for uc_raw_dict in generated_ucs_raw_list:
-        origin_id = str(uc_raw_dict.get('origin_id'))
-        bloom_level = uc_raw_dict.get('bloom_level')
-        if origin_id and bloom_level:
-            ucs_by_origin_then_bloom[origin_id][bloom_level] = uc_raw_dict
+    # Mapear UCs para acesso rápido: (origin_id, bloom_level) -> (uc_id, uc_text), montado por coluna.
+    # Em duplicatas vale a última UC; UCs sem id/texto ficam de fora e invalidam o grupo, como antes.
+    ucs_df = pd.DataFrame(generated_ucs_raw_list, columns=['uc_id', 'origin_id', 'bloom_level', 'uc_text'])
+    ucs_df['origin_id'] = ucs_df['origin_id'].astype(str)
+    ucs_df = ucs_df[ucs_df['bloom_level'].fillna('').astype(bool)]
+    ucs_df = ucs_df.drop_duplicates(subset=['origin_id', 'bloom_level'], keep='last')
+    ucs_df = ucs_df[ucs_df['uc_id'].fillna('').astype(bool) & ucs_df['uc_text'].fillna('').astype(bool)]
+    uc_by_origin_and_bloom: Dict[Tuple[str, str], Tuple[str, str]] = dict(zip(
+        zip(ucs_df['origin_id'], ucs_df['bloom_level']),
+        zip(ucs_df['uc_id'].astype(str), ucs_df['uc_text'].astype(str)),
+    ))
 
     # Usar DifficultyScheduler
     scheduler = OriginDifficultyScheduler(
@@ -71,12 +78,7 @@ def task_submit_difficulty_batch(run_id: str) -> Optional[str]:
         logging.info(f"Nenhum conjunto de origens pareado para avaliação de dificuldade (run_id: {run_id}).")
         return None
 
-    try:
-        with open(PROMPT_UC_DIFFICULTY_FILE, 'r', encoding='utf-8') as f:
-            prompt_template = f.read()
-    except Exception as e:
-        logging.error(f"Erro crítico lendo prompt de dificuldade '{PROMPT_UC_DIFFICULTY_FILE}': {e}", exc_info=True)
-        raise ValueError(f"Falha ao ler prompt de dificuldade: {e}") from e
+    prompt_template = load_prompt(PROMPT_UC_DIFFICULTY_FILE)
 
     generic_llm_requests: List[GenericLLMRequest] = []
 
@@ -94,12 +96,9 @@ def task_submit_difficulty_batch(run_id: str) -> Optional[str]:
             valid_group_for_llm = True
 
             for origin_id_in_group in origin_ids_in_pairing:
-                uc_data = ucs_by_origin_then_bloom.get(str(origin_id_in_group), {}).get(current_bloom_level)
-                if uc_data and uc_data.get('uc_id') and uc_data.get('uc_text'):
-                    ucs_for_this_llm_request_payload.append({
-                        "uc_id": str(uc_data['uc_id']),
-                        "uc_text": str(uc_data['uc_text'])
-                    })
+                uc_data = uc_by_origin_and_bloom.get((str(origin_id_in_group), current_bloom_level))
+                if uc_data:
+                    ucs_for_this_llm_request_payload.append({"uc_id": uc_data[0], "uc_text": uc_data[1]})
                 else:
                     valid_group_for_llm = False
                     break  # Um UC faltando no grupo/nível invalida este request específico
@@ -185,18 +184,13 @@ def task_submit_difficulty_batch(run_id: str) -> Optional[str]:
     llm_client_instance: LLMClient = get_llm_strategy()
 
     try:
-        provider_file_id = llm_client_instance.prepare_and_upload_batch_file(
-            generic_requests=generic_llm_requests,
-            batch_input_file_path=batch_intermediate_file_path,
-            batch_endpoint_url="/v1/chat/completions"
-        )
-        logging.info(
-            f"Arquivo de batch de dificuldade preparado e upload concluído. Provider File ID: {provider_file_id}")
-
-        batch_job_id = llm_client_instance.create_batch_job(
-            input_file_id=provider_file_id,
+        llm_client_instance.format_batch_file(generic_llm_requests, batch_intermediate_file_path, "/v1/chat/completions")
+        # Acima dos limites por arquivo do provedor vira mais de um batch (ids juntos em llm_batch_id)
+        batch_job_id = submit_batch_file(
+            llm_client_instance,
+            batch_intermediate_file_path,
             endpoint="/v1/chat/completions",
-            metadata={'description': f'UC Difficulty Evaluation Batch for run_id {run_id}'}
+            description=f'UC Difficulty Evaluation Batch for run_id {run_id}'
         )
         logging.info(f"Batch job de dificuldade criado. Provider Batch ID: {batch_job_id}")
         return batch_job_id
@@ -16,6 +16,7 @@ from app.scripts.constants import (
     PROMPT_UC_GENERATION_FILE,
     LLM_MODEL,
     LLM_TEMPERATURE_GENERATION,
+    UC_GENERATION_SHARD_SIZE,
     AIRFLOW_DATA_DIR,
     get_dirs
 )
@@ -24,20 +25,20 @@ from app.scripts.llm_core.models import (
     GenericLLMRequest, GenericLLMMessage, GenericLLMRequestConfig
 )
 from app.scripts.llm_client import get_llm_strategy, LLMClient, OpenAIBatchClient
+from app.scripts.batch_utils import join_batch_ids, submit_batch_file
+from app.scripts.io_utils import load_prompt
 
-def task_submit_uc_generation_batch(run_id: str) -> Optional[str]:
+def build_uc_generation_requests(run_id: str) -> List[GenericLLMRequest]:
     """
-    Prepara GenericLLMRequests e submete batch de geração UC para um run_id.
-    Retorna o llm_batch_id do provedor, ou None se nada foi submetido.
+    Seleciona as origens do run_id e monta os GenericLLMRequests de geração de UC.
+    Compartilhado pelo caminho Batch API e pelo caminho em tempo real. Lista vazia se nada a processar.
     """
-    logging.info(f"--- LOGIC: submit_uc_generation_batch (run_id={run_id}) ---")
-
     with get_session() as db:
         ku_origins_records = crud_knowledge_unit_origins.get_knowledge_unit_origins(db, run_id)
 
     if not ku_origins_records:
         logging.warning(f"Nenhuma KU Origin encontrada no DB para run_id={run_id}. Nada a submeter para geração.")
-        return None
+        return []
 
     graphrag_base_dir_for_selector = Path(AIRFLOW_DATA_DIR) / run_id / "output"
     if MAX_ORIGINS_FOR_TESTING is not None and MAX_ORIGINS_FOR_TESTING > 0:
@@ -48,14 +49,9 @@ def task_submit_uc_generation_batch(run_id: str) -> Optional[str]:
 
     if not origins_to_process:
         logging.warning(f"Nenhuma origem selecionada para processar para run_id={run_id}. Nada a submeter.")
-        return None
+        return []
 
-    try:
-        with open(PROMPT_UC_GENERATION_FILE, 'r', encoding='utf-8') as f:
-            prompt_template = f.read()
-    except Exception as e:
-        logging.error(f"Erro crítico lendo prompt de geração UC '{PROMPT_UC_GENERATION_FILE}': {e}", exc_info=True)
-        raise ValueError(f"Falha ao ler prompt de geração: {e}") from e
+    prompt_template = load_prompt(PROMPT_UC_GENERATION_FILE)
 
     generic_llm_requests: List[GenericLLMRequest] = []
     for i, origin_data in enumerate(origins_to_process):
@@ -90,6 +86,17 @@ def task_submit_uc_generation_batch(run_id: str) -> Optional[str]:
             GenericLLMRequest(request_metadata=request_meta, messages=messages, config=config)
         )
 
+    return generic_llm_requests
+
+def task_submit_uc_generation_batch(run_id: str) -> Optional[str]:
+    """
+    Prepara GenericLLMRequests e submete batch de geração UC para um run_id.
+    Acima de UC_GENERATION_SHARD_SIZE requests, divide em vários batches submetidos em paralelo.
+    Retorna o llm_batch_id do provedor (ids separados por vírgula se houver shards), ou None se nada foi submetido.
+    """
+    logging.info(f"--- LOGIC: submit_uc_generation_batch (run_id={run_id}) ---")
+
+    generic_llm_requests = build_uc_generation_requests(run_id)
     if not generic_llm_requests:
         logging.warning(
             f"Nenhum request LLM genérico preparado para geração de UC (run_id: {run_id}). Nada a submeter.")
@@ -98,25 +105,50 @@ def task_submit_uc_generation_batch(run_id: str) -> Optional[str]:
     _, _, batch_files_dir_for_run, _, _, _, _, _ = get_dirs(run_id) 
     batch_files_dir_for_run.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    batch_intermediate_file_path = batch_files_dir_for_run / f"openai_uc_generation_batch_{timestamp}_{run_id}.jsonl"
+
+    shard_size = UC_GENERATION_SHARD_SIZE if UC_GENERATION_SHARD_SIZE > 0 else len(generic_llm_requests)
+    request_shards = [
+        generic_llm_requests[start:start + shard_size]
+        for start in range(0, len(generic_llm_requests), shard_size)
+    ]
 
     llm_client_instance: LLMClient = get_llm_strategy()
 
     try:
-        provider_file_id = llm_client_instance.prepare_and_upload_batch_file(
-            generic_requests=generic_llm_requests,
-            batch_input_file_path=batch_intermediate_file_path,
-            batch_endpoint_url="/v1/chat/completions"
-        )
-        logging.info(f"Arquivo de batch preparado e upload concluído. Provider File ID: {provider_file_id}")
-
-        batch_job_id = llm_client_instance.create_batch_job(
-            input_file_id=provider_file_id,
+        if len(request_shards) == 1:
+            batch_intermediate_file_path = batch_files_dir_for_run / f"openai_uc_generation_batch_{timestamp}_{run_id}.jsonl"
+            llm_client_instance.format_batch_file(generic_llm_requests, batch_intermediate_file_path, "/v1/chat/completions")
+            # Sem shards (UC_GENERATION_SHARD_SIZE=0) o arquivo pode passar dos limites do provedor: upload_merged divide
+            batch_job_id = submit_batch_file(
+                llm_client_instance,
+                batch_intermediate_file_path,
+                endpoint="/v1/chat/completions",
+                description=f'UC Generation Batch for run_id {run_id}'
+            )
+            logging.info(f"Batch job de geração criado. Provider Batch ID: {batch_job_id}")
+            return batch_job_id
+
+        # Vários shards: cada batch anda na fila do provedor de forma independente,
+        # então a latência total é a do shard mais lento e não a de um arquivo gigante.
+        shard_file_paths: List[Path] = []
+        for shard_index, shard_requests in enumerate(request_shards):
+            shard_file_path = (batch_files_dir_for_run /
+                               f"openai_uc_generation_batch_{timestamp}_{run_id}_shard{shard_index:03d}.jsonl")
+            llm_client_instance.format_batch_file(shard_requests, shard_file_path, "/v1/chat/completions")
+            shard_file_paths.append(shard_file_path)
+        logging.info(f"{len(generic_llm_requests)} requests divididos em {len(shard_file_paths)} shards de até {shard_size}.")
+
+        shard_numbers = {path: i for i, path in enumerate(shard_file_paths)}
+        batch_job_ids = llm_client_instance.submit_batches(
+            shard_file_paths,
             endpoint="/v1/chat/completions",
-            metadata={'description': f'UC Generation Batch for run_id {run_id}'}
+            metadata_fn=lambda path: {
+                'description': f'UC Generation Batch for run_id {run_id} '
+                               f'(shard {shard_numbers[path] + 1}/{len(shard_file_paths)})'
+            }
         )
-        logging.info(f"Batch job de geração criado. Provider Batch ID: {batch_job_id}")
-        return batch_job_id
+        logging.info(f"{len(batch_job_ids)} batch jobs de geração criados. Provider Batch IDs: {batch_job_ids}")
+        return join_batch_ids(batch_job_ids)
     except Exception as e:
         logging.exception(
             f"Falha ao preparar, fazer upload ou submeter batch de geração de UC ao LLM (run_id: {run_id})")
@@ -1,10 +1,9 @@
 import logging
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any
-from collections import defaultdict
 
-from app.scripts.constants import BLOOM_ORDER_MAP, BASE_INPUT_DIR, GENERATED_UCS_RAW, REL_INTERMEDIATE
-from app.scripts.rel_utils import _add_relationships_avoiding_duplicates, _prepare_expands_lookups, _create_expands_links
+from app.scripts.constants import BASE_INPUT_DIR, GENERATED_UCS_RAW, REL_INTERMEDIATE
+from app.scripts.rel_utils import RelSet, _create_requires_links, _prepare_expands_lookups, _create_expands_links
 
 class RelationBuilder(ABC):
     """Interface e pipeline para construir relações entre UCs."""
@@ -16,66 +15,40 @@ class RelationBuilder(ABC):
         return next_builder
 
     def build(self, relations: List[Dict[str, Any]], context: Dict[str, Any]) -> List[Dict[str, Any]]:
-        # Executa o handler atual
-        updated = self._handle(relations, context)
+        return self._build(RelSet(relations), context).list
+
+    def _build(self, rel_set: RelSet, context: Dict[str, Any]) -> RelSet:
+        # Executa o handler atual; o mesmo RelSet segue pela cadeia e evita duplicatas
+        rel_set.add_many(self._handle(rel_set.list, context))
         # Chama próximo se existir
         if self._next:
-            return self._next.build(updated, context)
-        return updated
+            return self._next._build(rel_set, context)
+        return rel_set
 
     @abstractmethod
     def _handle(self, relations: List[Dict[str, Any]], context: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Implementar lógica de construção de relações."""
+        """Implementar lógica de construção de relações. Retorna apenas as novas relações."""
         pass
 
 class RequiresBuilder(RelationBuilder):
     """Builder que gera relações do tipo REQUIRES segundo ordem de Bloom."""
     def _handle(self, relations: List[Dict[str, Any]], context: Dict[str, Any]) -> List[Dict[str, Any]]:
-        generated = context.get('generated_ucs', [])
-        # Agrupa por origem
-        ucs_by_origin = defaultdict(list)
-        for uc in generated:
-            origin_id = uc.get('origin_id')
-            if origin_id:
-                ucs_by_origin[origin_id].append(uc)
-        new_rels = []
-        for origin_id, ucs in ucs_by_origin.items():
-            # Ordena pelo nível Bloom
-            sorted_ucs = sorted(
-                ucs,
-                key=lambda u: BLOOM_ORDER_MAP.get(u.get('bloom_level'), 99)
-            )
-            # Cria relações sequenciais
-            for i in range(len(sorted_ucs) - 1):
-                s_uc = sorted_ucs[i]
-                t_uc = sorted_ucs[i + 1]
-                s_idx = BLOOM_ORDER_MAP.get(s_uc.get('bloom_level'))
-                t_idx = BLOOM_ORDER_MAP.get(t_uc.get('bloom_level'))
-                if s_idx is not None and t_idx == s_idx + 1:
-                    new_rels.append({
-                        'source': s_uc.get('uc_id'),
-                        'target': t_uc.get('uc_id'),
-                        'type': 'REQUIRES',
-                        'origin_id': origin_id
-                    })
-        # Evita duplicadas
-        return _add_relationships_avoiding_duplicates(relations, new_rels)
+        return _create_requires_links(context.get('generated_ucs_df'))
 
 class ExpandsBuilder(RelationBuilder):
     """Builder que gera relações do tipo EXPANDS baseadas no GraphRAG."""
     def _handle(self, relations: List[Dict[str, Any]], context: Dict[str, Any]) -> List[Dict[str, Any]]:
         rels_df = context.get('relationships_df')
         entities_df = context.get('entities_df')
-        generated = context.get('generated_ucs', [])
+        generated_df = context.get('generated_ucs_df')
         if rels_df is None or entities_df is None:
             logging.warning("Pulando EXPANDS (inputs não carregados).")
-            return relations
+            return []
         # Prepara lookups e UC levels
-        name_to_id, ucs_by_level = _prepare_expands_lookups(entities_df, generated)
+        name_to_id, ucs_by_level = _prepare_expands_lookups(entities_df, generated_df)
         if not name_to_id:
             logging.warning("Pulando EXPANDS (mapa nome->ID falhou).")
-            return relations
+            return []
         # Cria relações EXPANDS
         new_rels = _create_expands_links(rels_df, name_to_id, ucs_by_level)
-        # Evita duplicatas
-        return _add_relationships_avoiding_duplicates(relations, new_rels)
\ No newline at end of file
+        return new_rels
\ No newline at end of file
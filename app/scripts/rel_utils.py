@@ -1,28 +1,77 @@
+import numpy as np
 import pandas as pd
 import logging
-from typing import List, Dict, Any
-from collections import defaultdict
+from typing import List, Dict, Any, Optional
 
 from app.scripts.constants import BLOOM_ORDER, BLOOM_ORDER_MAP
 
+def _adjacency_pairs(origin_codes: np.ndarray, bloom_idx: np.ndarray) -> np.ndarray:
+    """Índices i (já ordenados por origem/nível) em que i -> i+1 é um par REQUIRES."""
+    is_pair = (origin_codes[1:] == origin_codes[:-1]) & (bloom_idx[1:] == bloom_idx[:-1] + 1)
+    return np.flatnonzero(is_pair)
+
+def name_id_map(entities_df: Optional[pd.DataFrame]) -> Dict[str, str]:
+    """Mapa título -> ID das entidades (vazio se faltar o DataFrame ou as colunas 'title'/'id')."""
+    if entities_df is None or 'title' not in entities_df.columns or 'id' not in entities_df.columns:
+        return {}
+    return dict(zip(entities_df['title'].to_numpy(), entities_df['id'].to_numpy()))
+
+def _create_requires_links(generated_ucs_df: Optional[pd.DataFrame]) -> List[Dict[str, Any]]:
+    """
+    Cria as relações REQUIRES entre UCs consecutivas na ordem de Bloom de cada origem.
+    Ordena por (origem, nível) e compara cada posição com a seguinte em arrays NumPy contíguos;
+    a ordem de saída segue a primeira aparição de cada origem, como no agrupamento por dict.
+    """
+    key_cols = ['origin_id', 'bloom_level', 'uc_id']
+    if generated_ucs_df is None or not set(key_cols).issubset(generated_ucs_df.columns):
+        return []
+    ucs = generated_ucs_df[key_cols]
+    ucs = ucs[ucs['origin_id'].fillna('').astype(bool)]
+    # Códigos da origem na ordem de primeira aparição (antes de descartar níveis desconhecidos)
+    origin_codes = pd.factorize(ucs['origin_id'])[0]
+    bloom_idx = ucs['bloom_level'].map(BLOOM_ORDER_MAP).to_numpy(dtype=float)
+    # Níveis desconhecidos ficariam no fim do grupo e nunca formam par; podem sair antes
+    known = ~np.isnan(bloom_idx)
+    origin_codes, bloom_idx = origin_codes[known], bloom_idx[known]
+    uc_ids = ucs['uc_id'].to_numpy()[known]
+    origin_ids = ucs['origin_id'].to_numpy()[known]
+    # lexsort é estável: empates no nível mantêm a ordem original dentro da origem
+    order = np.lexsort((bloom_idx, origin_codes))
+    origin_codes, bloom_idx, uc_ids, origin_ids = (
+        origin_codes[order], bloom_idx[order], uc_ids[order], origin_ids[order])
+    pair_idx = _adjacency_pairs(origin_codes, bloom_idx)
+    requires_df = pd.DataFrame({
+        'source': uc_ids[pair_idx],
+        'target': uc_ids[pair_idx + 1],
+        'type': 'REQUIRES',
+        'origin_id': origin_ids[pair_idx],
+    })
+    logging.info(f"Candidatas a {len(requires_df)} novas relações REQUIRES.")
+    return requires_df.to_dict('records')
+
 def _prepare_expands_lookups(
     entities_df: pd.DataFrame,
-    generated_ucs: List[Dict[str, Any]]
+    generated_ucs_df: pd.DataFrame
 ) -> (Dict[str, str], Dict[str, Dict[str, List[str]]]):
     """Prepara os dicionários de lookup necessários para definir relações EXPANDS."""
-    entity_name_to_id: Dict[str, str] = {}
-    if entities_df is not None and 'title' in entities_df.columns and 'id' in entities_df.columns:
-        entity_name_to_id = pd.Series(entities_df.id.values, index=entities_df.title).to_dict()
+    entity_name_to_id = name_id_map(entities_df)
+    if entity_name_to_id:
         logging.info(f"Criado mapa nome->ID ({len(entity_name_to_id)} entidades).")
     else:
         logging.warning("Não foi possível criar mapa nome->ID para EXPANDS.")
-    ucs_by_origin_level: Dict[str, Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
-    for uc in generated_ucs:
-        origin_id = uc.get("origin_id")
-        bloom_level = uc.get("bloom_level")
-        uc_id = uc.get("uc_id")
-        if origin_id and bloom_level and uc_id and bloom_level in BLOOM_ORDER_MAP:
-            ucs_by_origin_level[origin_id][bloom_level].append(uc_id)
+    ucs_by_origin_level: Dict[str, Dict[str, List[str]]] = {}
+    key_cols = ['origin_id', 'bloom_level', 'uc_id']
+    if generated_ucs_df is not None and set(key_cols).issubset(generated_ucs_df.columns):
+        ucs = generated_ucs_df[key_cols]
+        ucs = ucs[
+            ucs['bloom_level'].isin(BLOOM_ORDER)
+            & ucs['origin_id'].fillna('').astype(bool)
+            & ucs['uc_id'].fillna('').astype(bool)
+        ]
+        # groupby(sort=False) mantém a ordem original das UCs dentro de cada (origem, nível)
+        grouped = ucs.groupby(['origin_id', 'bloom_level'], sort=False)['uc_id'].agg(list)
+        for (origin_id, bloom_level), uc_ids in grouped.items():
+            ucs_by_origin_level.setdefault(origin_id, {})[bloom_level] = uc_ids
     logging.info(f"Criado mapa UC por origem/nível ({len(ucs_by_origin_level)} origens).")
     return entity_name_to_id, ucs_by_origin_level
 
@@ -31,81 +80,107 @@ def _create_expands_links(
     entity_name_to_id: Dict[str, str],
     ucs_by_origin_level: Dict[str, Dict[str, List[str]]]
 ) -> List[Dict[str, Any]]:
-    """Cria as relações EXPANDS com base nas relações do GraphRAG."""
-    new_expands_rels = []
-    processed_graphrag_rels = 0
-    skipped_missing_entity = 0
+    """
+    Cria as relações EXPANDS com base nas relações do GraphRAG.
+    O produto cartesiano UC x UC por nível é feito com merges (hash join) em vez de loops Python;
+    a ordem de saída é a mesma da iteração relação -> nível -> UC origem -> UC destino -> (ida, volta).
+    """
     LEVELS_TO_CONNECT = ["Lembrar", "Entender"]
     logging.info(f"Processando {len(relationships_df)} relações GraphRAG para EXPANDS (Níveis: {LEVELS_TO_CONNECT})...")
     if not ('source' in relationships_df.columns and 'target' in relationships_df.columns):
         logging.error("'source'/'target' faltando em relationships.parquet.")
         return []
-    for row in relationships_df.itertuples(index=False):
-        s_name = row.source
-        t_name = row.target
-        weight_val = getattr(row, 'weight', 1.0)
-        rel_weight = float(weight_val) if pd.notna(weight_val) else 1.0
-        rel_desc = getattr(row, 'description', None)
-        desc_clean = rel_desc if rel_desc is not None and pd.notna(rel_desc) else None
-        s_id = entity_name_to_id.get(s_name)
-        t_id = entity_name_to_id.get(t_name)
-        if not s_id or not t_id:
-            skipped_missing_entity += 1
-            continue
-        if s_id == t_id:
-            continue
-        if s_id in ucs_by_origin_level and t_id in ucs_by_origin_level:
-            processed_graphrag_rels += 1
-            for bloom_level in LEVELS_TO_CONNECT:
-                s_ucs = ucs_by_origin_level[s_id].get(bloom_level, [])
-                t_ucs = ucs_by_origin_level[t_id].get(bloom_level, [])
-                if s_ucs and t_ucs:
-                    for s_uc_id in s_ucs:
-                        for t_uc_id in t_ucs:
-                            rel = {
-                                "source": s_uc_id,
-                                "target": t_uc_id,
-                                "type": "EXPANDS",
-                                "weight": rel_weight,
-                                "graphrag_rel_desc": desc_clean,
-                                "origin_id": s_id,
-                            }
-                            new_expands_rels.append(rel)
-                            rev_rel = {
-                                "source": t_uc_id,
-                                "target": s_uc_id,
-                                "type": "EXPANDS",
-                                "weight": rel_weight,
-                                "graphrag_rel_desc": desc_clean,
-                                "origin_id": t_id,
-                            }
-                            new_expands_rels.append(rev_rel)
+
+    s_ids = relationships_df['source'].map(entity_name_to_id)
+    t_ids = relationships_df['target'].map(entity_name_to_id)
+    is_mapped = s_ids.notna() & s_ids.astype(bool) & t_ids.notna() & t_ids.astype(bool)
+    skipped_missing_entity = int((~is_mapped).sum())
+
+    if 'weight' in relationships_df.columns:
+        weights = relationships_df['weight'].astype(float).fillna(1.0)
+    else:
+        weights = pd.Series(1.0, index=relationships_df.index)
+    if 'description' in relationships_df.columns:
+        descs = relationships_df['description']
+    else:
+        descs = pd.Series(None, index=relationships_df.index, dtype=object)
+
+    rels = pd.DataFrame({
+        "rel_idx": range(len(relationships_df)),
+        "s_id": s_ids.to_numpy(),
+        "t_id": t_ids.to_numpy(),
+        "weight": weights.to_numpy(),
+        "graphrag_rel_desc": descs.to_numpy(),
+    })[is_mapped.to_numpy()]
+    rels = rels[rels['s_id'] != rels['t_id']]
+    rels = rels[rels['s_id'].isin(ucs_by_origin_level.keys()) & rels['t_id'].isin(ucs_by_origin_level.keys())]
+    processed_graphrag_rels = len(rels)
+
+    ucs = pd.DataFrame(
+        [
+            (origin_id, level_idx, uc_pos, uc_id)
+            for origin_id, ucs_by_level in ucs_by_origin_level.items()
+            for level_idx, bloom_level in enumerate(LEVELS_TO_CONNECT)
+            for uc_pos, uc_id in enumerate(ucs_by_level.get(bloom_level, []))
+        ],
+        columns=["origin_id", "level_idx", "uc_pos", "uc_id"],
+    )
+
+    new_expands_rels: List[Dict[str, Any]] = []
+    if not rels.empty and not ucs.empty:
+        pairs = rels.merge(
+            ucs.rename(columns={"origin_id": "s_id", "uc_pos": "s_pos", "uc_id": "s_uc"}), on="s_id"
+        ).merge(
+            ucs.rename(columns={"origin_id": "t_id", "uc_pos": "t_pos", "uc_id": "t_uc"}), on=["t_id", "level_idx"]
+        )
+        forward = pairs.assign(source=pairs['s_uc'], target=pairs['t_uc'], origin_id=pairs['s_id'], direction=0)
+        reverse = pairs.assign(source=pairs['t_uc'], target=pairs['s_uc'], origin_id=pairs['t_id'], direction=1)
+        expands_df = pd.concat([forward, reverse], ignore_index=True).sort_values(
+            ["rel_idx", "level_idx", "s_pos", "t_pos", "direction"], kind="mergesort"
+        )
+        expands_df["type"] = "EXPANDS"
+        # merges/concat transformam None em NaN; o consumidor espera None para descrição ausente
+        desc_col = expands_df["graphrag_rel_desc"].astype(object)
+        expands_df["graphrag_rel_desc"] = desc_col.where(desc_col.notna(), None)
+        new_expands_rels = expands_df[
+            ["source", "target", "type", "weight", "graphrag_rel_desc", "origin_id"]
+        ].to_dict('records')
+
     logging.info(f"Processadas {processed_graphrag_rels} relações GraphRAG com UCs.")
     if skipped_missing_entity > 0:
         logging.warning(f"{skipped_missing_entity} relações puladas (entidade não mapeada).")
     logging.info(f"Candidatas a {len(new_expands_rels)} novas relações EXPANDS.")
     return new_expands_rels
 
-def _add_relationships_avoiding_duplicates(
-    existing_rels: List[Dict[str, Any]],
-    new_rels: List[Dict[str, Any]]
-) -> List[Dict[str, Any]]:
-    """Adiciona novas relações a uma lista existente, evitando duplicatas."""
-    if not new_rels:
-        return existing_rels
-    updated_rels = list(existing_rels)
-    existing_rel_tuples = {(
-        r.get("source"), r.get("target"), r.get("type")
-    ) for r in updated_rels}
-    added_count = 0
-    for rel in new_rels:
-        rel_tuple = (rel.get("source"), rel.get("target"), rel.get("type"))
-        if rel_tuple not in existing_rel_tuples:
-            updated_rels.append(rel)
-            existing_rel_tuples.add(rel_tuple)
-            added_count += 1
-    logging.info(
-        f"{added_count} novas relações adicionadas "
-        f"({len(new_rels) - added_count} duplicatas evitadas)."
-    )
-    return updated_rels
\ No newline at end of file
+class RelSet:
+    """
+    Lista de relações com o conjunto de chaves (source, target, type) já vistas.
+    Mantido ao longo da cadeia de builders: cada add_many custa O(|novas|), sem reconstruir
+    as chaves das relações existentes a cada chamada.
+    """
+    KEY_COLS = ("source", "target", "type")
+
+    def __init__(self, relations: Optional[List[Dict[str, Any]]] = None):
+        self.list: List[Dict[str, Any]] = list(relations) if relations else []
+        self.seen = {self._key(rel) for rel in self.list}
+
+    @staticmethod
+    def _key(rel: Dict[str, Any]) -> tuple:
+        return rel.get("source"), rel.get("target"), rel.get("type")
+
+    def add_many(self, new_rels: List[Dict[str, Any]]) -> None:
+        """Adiciona as novas relações cuja chave ainda não foi vista, preservando a ordem."""
+        if not new_rels:
+            return
+        initial_count = len(self.list)
+        seen = self.seen
+        for rel in new_rels:
+            key = self._key(rel)
+            if key not in seen:
+                seen.add(key)
+                self.list.append(rel)
+        added_count = len(self.list) - initial_count
+        logging.info(
+            f"{added_count} novas relações adicionadas "
+            f"({len(new_rels) - added_count} duplicatas evitadas)."
+        )